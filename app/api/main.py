@@ -1,16 +1,84 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
 
 from app.config.settings import get_settings
-from app.models.schemas import AnalyzeStartupRequest, AnalyzeStartupResponse
-from app.services.pipeline import run_analysis
+from app.embeddings.batcher import EmbeddingBatcher
+from app.embeddings.cache import embedding_cache_stats
+from app.embeddings.registry import preload_embedding_model
+from app.ingestion.http_client import create_http_client
+from app.models.schemas import (
+    AnalysisJob,
+    AnalyzeStartupRequest,
+    AnalyzeStartupResponse,
+    BatchAnalyzeRequest,
+    BatchAnalyzeResult,
+)
+from app.services.jobs import JobManager, JobQueueFull
+from app.services.namespace_sweeper import NamespaceSweeper
+from app.services.pipeline import ProgressCallback, run_analysis
+from app.services.result_cache import ResultCache, request_fingerprint
+from app.utils.executors import shutdown_executors
 from app.utils.logger import setup_logger
+from app.utils.loop_monitor import LoopLagMonitor
 
 
 settings = get_settings()
 logger = setup_logger()
 
-app = FastAPI(title=settings.app_name, version="0.4.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await asyncio.to_thread(preload_embedding_model, settings.embedding_model)
+    app.state.http_client = create_http_client()
+    app.state.embedding_batcher = EmbeddingBatcher(
+        settings.embedding_model,
+        max_batch_size=settings.embedding_batch_max_size,
+        max_wait_ms=settings.embedding_batch_max_wait_ms,
+    )
+    app.state.result_cache = ResultCache(
+        ttl_seconds=settings.result_cache_ttl_seconds,
+        stale_seconds=settings.result_cache_stale_seconds,
+        max_entries=settings.result_cache_max_entries,
+    )
+    app.state.jobs = JobManager(
+        runner=lambda payload, on_event: _analyze(app, payload, on_event=on_event),
+        workers=settings.job_workers,
+        queue_size=settings.job_queue_size,
+        result_ttl_seconds=settings.job_result_ttl_seconds,
+    )
+    app.state.jobs.start()
+    app.state.loop_monitor = LoopLagMonitor(interval_seconds=settings.loop_lag_interval_seconds)
+    app.state.loop_monitor.start()
+    app.state.namespace_sweeper = NamespaceSweeper(
+        ttl_seconds=settings.qdrant_namespace_ttl_seconds,
+        interval_seconds=settings.qdrant_sweep_interval_seconds,
+    )
+    app.state.namespace_sweeper.start()
+    try:
+        yield
+    finally:
+        await app.state.namespace_sweeper.stop()
+        await app.state.loop_monitor.stop()
+        await app.state.jobs.stop()
+        await app.state.result_cache.close()
+        await app.state.http_client.aclose()
+        shutdown_executors()
+
+
+app = FastAPI(title=settings.app_name, version="0.4.0", lifespan=lifespan)
+
+
+def _pipeline_resources(app: FastAPI) -> dict:
+    # Shared per-process resources; absent when the app runs without its lifespan (e.g. bare TestClient).
+    return {
+        "http_client": getattr(app.state, "http_client", None),
+        "embedding_batcher": getattr(app.state, "embedding_batcher", None),
+    }
 
 
 UI_HTML = """
@@ -239,6 +307,24 @@ UI_HTML = """
       `;
     }
 
+    const SECTION_TITLES = {
+      market: "Market",
+      competition: "Competition",
+      traction: "Traction",
+      business_model: "Business Model",
+      risk_assessment: "Risk Assessment",
+    };
+    let streamedSections = {};
+
+    function renderSections(sectionMap) {
+      const sections = document.getElementById("sections");
+      sections.innerHTML = Object.keys(SECTION_TITLES)
+        .filter((key) => sectionMap[key])
+        .map((key) => renderSection(SECTION_TITLES[key], sectionMap[key]))
+        .join("");
+      report.classList.add("visible");
+    }
+
     function renderReport(data) {
       const r = data.report || {};
       document.getElementById("t-startup").textContent = r.startup_name || "-";
@@ -246,14 +332,13 @@ UI_HTML = """
       document.getElementById("t-rec").textContent = r.recommendation || "-";
       document.getElementById("t-sources").textContent = String(data.sources_indexed ?? "-");
 
-      const sections = document.getElementById("sections");
-      sections.innerHTML = [
-        renderSection("Market", r.market || {}),
-        renderSection("Competition", r.competition || {}),
-        renderSection("Traction", r.traction || {}),
-        renderSection("Business Model", r.business_model || {}),
-        renderSection("Risk Assessment", r.risk_assessment || {}),
-      ].join("");
+      renderSections({
+        market: r.market || {},
+        competition: r.competition || {},
+        traction: r.traction || {},
+        business_model: r.business_model || {},
+        risk_assessment: r.risk_assessment || {},
+      });
 
       const riskList = document.getElementById("risk-list");
       const risks = r.key_risks || [];
@@ -265,6 +350,61 @@ UI_HTML = """
       report.classList.add("visible");
     }
 
+    function resetReport() {
+      streamedSections = {};
+      ["t-startup", "t-date", "t-rec", "t-sources"].forEach((id) => {
+        document.getElementById(id).textContent = "-";
+      });
+      document.getElementById("sections").innerHTML = "";
+      document.getElementById("risk-list").innerHTML = "";
+      raw.textContent = "No output yet";
+      report.classList.remove("visible");
+    }
+
+    function handleEvent(event, data) {
+      if (event === "source") {
+        statusBox.textContent = `Fetched ${data.type} (${data.status}, ${data.latency_ms}ms)...`;
+      } else if (event === "stage" && data.status === "started") {
+        statusBox.textContent = `Running ${data.stage}...`;
+      } else if (event === "section") {
+        streamedSections[data.name] = data.section;
+        renderSections(streamedSections);
+      } else if (event === "result") {
+        renderReport(data);
+        statusBox.classList.add("ok");
+        const verdict = data?.evaluation?.judge_verdict || "n/a";
+        const latency = data?.metrics?.latency_ms || 0;
+        const cost = data?.metrics?.estimated_cost_usd || 0;
+        statusBox.textContent = `Analysis complete. Verdict: ${verdict} | Latency: ${latency}ms | Est. Cost: ${Number(cost).toFixed(6)}`;
+      } else if (event === "error") {
+        throw new Error(data.detail || "Request failed");
+      }
+    }
+
+    async function readEventStream(response) {
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary = buffer.indexOf("\\n\\n");
+        while (boundary !== -1) {
+          const frame = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          let event = "message";
+          let data = "";
+          frame.split("\\n").forEach((line) => {
+            if (line.startsWith("event: ")) event = line.slice(7);
+            else if (line.startsWith("data: ")) data += line.slice(6);
+          });
+          handleEvent(event, data ? JSON.parse(data) : {});
+          boundary = buffer.indexOf("\\n\\n");
+        }
+      }
+    }
+
     form.addEventListener("submit", async (event) => {
       event.preventDefault();
 
@@ -278,25 +418,24 @@ UI_HTML = """
       statusBox.classList.remove("error", "ok");
       statusBox.textContent = "Running analysis...";
       submitBtn.disabled = true;
+      resetReport();
 
       try {
-        const response = await fetch("/analyze_startup", {
+        const response = await fetch("/analyze_startup/stream", {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify(payload)
         });
 
-        const data = await response.json();
         if (!response.ok) {
+          const data = await response.json();
           throw new Error(data.detail || "Request failed");
         }
 
-        renderReport(data);
-        statusBox.classList.add("ok");
-        const verdict = data?.evaluation?.judge_verdict || "n/a";\n        const latency = data?.metrics?.latency_ms || 0;\n        const cost = data?.metrics?.estimated_cost_usd || 0;\n        statusBox.textContent = `Analysis complete. Verdict: ${verdict} | Latency: ${latency}ms | Est. Cost: ${Number(cost).toFixed(6)}`;
+        await readEventStream(response);
       } catch (err) {
         statusBox.classList.add("error");
-        statusBox.textContent = "Failed.";
+        statusBox.textContent = `Failed. ${err.message || ""}`;
         raw.textContent = String(err);
       } finally {
         submitBtn.disabled = false;
@@ -319,14 +458,155 @@ def ui() -> HTMLResponse:
 
 
 @app.get("/status")
-def status() -> dict:
-    return {"status": "ok", "env": settings.app_env, "phase": "phase_3"}
+async def status(request: Request) -> dict:
+    payload = {"status": "ok", "env": settings.app_env, "phase": "phase_3"}
+    loop_monitor = getattr(request.app.state, "loop_monitor", None)
+    if loop_monitor is not None:
+        payload["event_loop_lag"] = loop_monitor.snapshot()
+    cache_stats = embedding_cache_stats()
+    if cache_stats is not None:
+        payload["embedding_cache"] = cache_stats
+    return payload
+
+
+async def _analyze(
+    app: FastAPI,
+    payload: AnalyzeStartupRequest,
+    force_refresh: bool = False,
+    on_event: Optional[ProgressCallback] = None,
+) -> AnalyzeStartupResponse:
+    # Every entry point (plain, stream, batch, jobs) goes through the result cache and its single-flight.
+    resources = _pipeline_resources(app)
+    result_cache = getattr(app.state, "result_cache", None)
+    if result_cache is None:
+        return await run_analysis(payload, on_event=on_event, **resources)
+    return await result_cache.get_or_run(
+        request_fingerprint(payload),
+        lambda emit: run_analysis(payload, on_event=emit, **resources),
+        force_refresh=force_refresh,
+        on_event=on_event,
+    )
 
 
 @app.post("/analyze_startup", response_model=AnalyzeStartupResponse)
-async def analyze_startup(payload: AnalyzeStartupRequest) -> AnalyzeStartupResponse:
+async def analyze_startup(
+    payload: AnalyzeStartupRequest,
+    request: Request,
+    refresh: bool = Query(default=False, description="Bypass the result cache and re-run the pipeline."),
+) -> AnalyzeStartupResponse:
+    force_refresh = refresh or "no-cache" in request.headers.get("cache-control", "").lower()
+
     try:
-        return await run_analysis(payload)
+        return await _analyze(request.app, payload, force_refresh=force_refresh)
     except Exception as exc:
         logger.exception("Failed to analyze startup")
         raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/analyze_startup/stream")
+async def analyze_startup_stream(payload: AnalyzeStartupRequest, request: Request) -> StreamingResponse:
+    """
+    Server-Sent Events variant of /analyze_startup: emits "source", "stage" and
+    "section" events as the pipeline progresses, then "result" (or "error").
+    """
+    events: asyncio.Queue[Optional[tuple[str, dict]]] = asyncio.Queue()
+
+    def on_event(event: str, data: dict) -> None:
+        events.put_nowait((event, data))
+
+    async def run() -> None:
+        try:
+            response = await _analyze(request.app, payload, on_event=on_event)
+            events.put_nowait(("result", response.model_dump(mode="json")))
+        except Exception as exc:
+            logger.exception("Failed to analyze startup")
+            events.put_nowait(("error", {"detail": str(exc)}))
+        finally:
+            events.put_nowait(None)
+
+    async def stream() -> AsyncIterator[str]:
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                yield _sse(*item)
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/analyze_startup/batch")
+async def analyze_startup_batch(batch: BatchAnalyzeRequest, request: Request) -> StreamingResponse:
+    """
+    Runs many analyses with bounded concurrency and streams one NDJSON line
+    (BatchAnalyzeResult) per startup in completion order.
+    """
+    if len(batch.items) > settings.batch_max_items:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {settings.batch_max_items} items.")
+
+    semaphore = asyncio.Semaphore(batch.concurrency or settings.batch_concurrency)
+
+    async def run_item(index: int, payload: AnalyzeStartupRequest) -> BatchAnalyzeResult:
+        async with semaphore:
+            try:
+                response = await _analyze(request.app, payload)
+            except Exception as exc:
+                logger.warning("batch_item_failed index=%s startup=%s error=%s", index, payload.startup_name, exc)
+                return BatchAnalyzeResult(
+                    index=index,
+                    startup_name=payload.startup_name,
+                    status="error",
+                    error=str(exc) or exc.__class__.__name__,
+                )
+        return BatchAnalyzeResult(index=index, startup_name=payload.startup_name, status="ok", response=response)
+
+    async def stream() -> AsyncIterator[str]:
+        tasks = [asyncio.create_task(run_item(i, item)) for i, item in enumerate(batch.items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                yield result.model_dump_json() + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+def _job_manager(request: Request) -> JobManager:
+    jobs = getattr(request.app.state, "jobs", None)
+    if jobs is None:
+        raise HTTPException(status_code=503, detail="Job workers are not running.")
+    return jobs
+
+
+@app.post("/jobs", response_model=AnalysisJob, status_code=202)
+async def submit_job(payload: AnalyzeStartupRequest, request: Request) -> AnalysisJob:
+    try:
+        return _job_manager(request).submit(payload)
+    except JobQueueFull as exc:
+        raise HTTPException(
+            status_code=429,
+            detail=str(exc),
+            headers={"Retry-After": str(exc.retry_after_seconds)},
+        ) from exc
+
+
+@app.get("/jobs/{job_id}", response_model=AnalysisJob)
+async def get_job(job_id: str, request: Request) -> AnalysisJob:
+    job = _job_manager(request).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired.")
+    return job
@@ -14,19 +14,71 @@ class Settings:
     app_port: int = int(os.getenv("PORT", os.getenv("APP_PORT", "8000")))
 
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+    embedding_cache_max_entries: int = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+    embedding_cache_dtype: str = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+
+    cache_dir: str = os.path.expanduser(os.getenv("CACHE_DIR", "~/.cache/venturelens"))
 
     qdrant_url: str = os.getenv("QDRANT_URL", "")
     qdrant_api_key: str = os.getenv("QDRANT_API_KEY", "")
     qdrant_collection: str = os.getenv("QDRANT_COLLECTION", "venturelens_docs")
     qdrant_local_path: str = os.getenv("QDRANT_LOCAL_PATH", ":memory:")
+    qdrant_upsert_batch_size: int = int(os.getenv("QDRANT_UPSERT_BATCH_SIZE", "256"))
+    qdrant_upsert_parallelism: int = int(os.getenv("QDRANT_UPSERT_PARALLELISM", "4"))
+    qdrant_upsert_wait: bool = os.getenv("QDRANT_UPSERT_WAIT", "false").lower() in {"1", "true", "yes"}
+    qdrant_namespace_ttl_seconds: float = float(os.getenv("QDRANT_NAMESPACE_TTL_SECONDS", "604800"))
+    qdrant_sweep_interval_seconds: float = float(os.getenv("QDRANT_SWEEP_INTERVAL_SECONDS", "3600"))
+    local_ann_min_points: int = int(os.getenv("LOCAL_ANN_MIN_POINTS", "50000"))
+    local_ann_nprobe: int = int(os.getenv("LOCAL_ANN_NPROBE", "8"))
+    local_ann_lists: int = int(os.getenv("LOCAL_ANN_LISTS", "0"))
+    local_vector_store_path: str = os.path.expanduser(os.getenv("LOCAL_VECTOR_STORE_PATH", ""))
+    local_vector_dtype: str = os.getenv("LOCAL_VECTOR_DTYPE", "float32")
+    local_vector_rescore: bool = os.getenv("LOCAL_VECTOR_RESCORE", "true").lower() in {"1", "true", "yes"}
+    keyword_index_enabled: bool = os.getenv("KEYWORD_INDEX_ENABLED", "false").lower() in {"1", "true", "yes"}
 
     llama_cloud_api_key: str = os.getenv("LLAMA_CLOUD_API_KEY", "")
 
     request_timeout_seconds: float = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "20"))
     request_verify_ssl: bool = os.getenv("REQUEST_VERIFY_SSL", "false").lower() in {"1", "true", "yes"}
 
-    max_chunk_size: int = int(os.getenv("MAX_CHUNK_SIZE", "800"))
-    chunk_overlap: int = int(os.getenv("CHUNK_OVERLAP", "120"))
+    http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    http_max_keepalive_connections: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    http_keepalive_expiry_seconds: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "30"))
+    http2_enabled: bool = os.getenv("HTTP2_ENABLED", "true").lower() in {"1", "true", "yes"}
+
+    http_cache_enabled: bool = os.getenv("HTTP_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"}
+    http_cache_max_bytes: int = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    http_cache_ttl_website_seconds: float = float(os.getenv("HTTP_CACHE_TTL_WEBSITE_SECONDS", "3600"))
+    http_cache_ttl_news_seconds: float = float(os.getenv("HTTP_CACHE_TTL_NEWS_SECONDS", "600"))
+    http_cache_ttl_pdf_seconds: float = float(os.getenv("HTTP_CACHE_TTL_PDF_SECONDS", "604800"))
+
+    ingestion_concurrency: int = int(os.getenv("INGESTION_CONCURRENCY", "4"))
+    ingestion_source_timeout_seconds: float = float(os.getenv("INGESTION_SOURCE_TIMEOUT_SECONDS", "30"))
+
+    result_cache_ttl_seconds: float = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "900"))
+    result_cache_stale_seconds: float = float(os.getenv("RESULT_CACHE_STALE_SECONDS", "3600"))
+    result_cache_max_entries: int = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256"))
+
+    job_workers: int = int(os.getenv("JOB_WORKERS", "2"))
+    job_queue_size: int = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+    job_result_ttl_seconds: float = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+
+    batch_concurrency: int = int(os.getenv("BATCH_CONCURRENCY", "4"))
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+    embedding_batch_max_size: int = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "256"))
+    embedding_batch_max_wait_ms: float = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "10"))
+
+    cpu_executor_kind: str = os.getenv("CPU_EXECUTOR_KIND", "thread").lower()
+    cpu_executor_workers: int = int(os.getenv("CPU_EXECUTOR_WORKERS", "0"))
+    blocking_executor_workers: int = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", "8"))
+    loop_lag_interval_seconds: float = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.1"))
+
+    # 0 = the embedding model's own sequence limit (200 approximate tokens without a tokenizer).
+    chunk_max_tokens: int = int(os.getenv("CHUNK_MAX_TOKENS", "0"))
+    chunk_overlap_tokens: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+    dedup_enabled: bool = os.getenv("DEDUP_ENABLED", "true").lower() in {"1", "true", "yes"}
+    dedup_threshold: float = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
 
 
 @lru_cache
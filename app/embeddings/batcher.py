@@ -0,0 +1,79 @@
+import asyncio
+from typing import Optional
+
+import numpy as np
+
+from app.embeddings.embedder import BGEEmbedder
+from app.utils.executors import run_blocking
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embed_texts calls from different analyses into shared
+    model calls. Requests arriving within `max_wait_ms` of each other (up to
+    `max_batch_size` texts) are encoded together.
+
+    Only meaningful for the transformer backend: TF-IDF vectors are fit per
+    corpus, so callers must embed those themselves (see `enabled`).
+    """
+
+    def __init__(self, model_name: str, max_batch_size: int = 256, max_wait_ms: float = 10.0) -> None:
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self._embedder = BGEEmbedder(model_name)
+        self._pending: list[tuple[list[str], asyncio.Future]] = []
+        self._pending_texts = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # The event loop only keeps weak references to tasks; in-flight flushes are held here.
+        self._flush_tasks: set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self._embedder.uses_transformer
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self._embedder.dimension or 0), dtype=np.float32)
+
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((texts, future))
+        self._pending_texts += len(texts)
+
+        if self._pending_texts >= self.max_batch_size:
+            self._schedule_flush(loop, delay=0.0)
+        elif self._flush_handle is None:
+            self._schedule_flush(loop, delay=self.max_wait_seconds)
+        return await future
+
+    def _schedule_flush(self, loop: asyncio.AbstractEventLoop, delay: float) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self) -> None:
+        task = asyncio.ensure_future(self._flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def _flush(self) -> None:
+        batch, self._pending = self._pending, []
+        self._pending_texts = 0
+        self._flush_handle = None
+        if not batch:
+            return
+
+        all_texts = [text for texts, _ in batch for text in texts]
+        try:
+            vectors = await run_blocking(self._embedder.embed_texts, all_texts)
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        offset = 0
+        for texts, future in batch:
+            if not future.done():
+                future.set_result(vectors[offset : offset + len(texts)])
+            offset += len(texts)
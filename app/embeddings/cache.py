@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.config.settings import get_settings
+
+
+settings = get_settings()
+
+_DTYPES = {"float16": np.float16, "float32": np.float32}
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk embedding cache keyed by (model name, text hash).
+    Vectors are stored as raw float16/float32 bytes in SQLite; the least recently
+    used rows are evicted once `max_entries` is exceeded.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200_000, dtype: str = "float16") -> None:
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unsupported embedding cache dtype: {dtype}")
+
+        self.path = path
+        self.max_entries = max_entries
+        self.dtype = _DTYPES[dtype]
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def key(model_name: str, text: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, model_name: str, texts: Sequence[str]) -> list[Optional[np.ndarray]]:
+        if not texts:
+            return []
+
+        keys = [self.key(model_name, text) for text in texts]
+        key_list = json.dumps(sorted(set(keys)))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, vector FROM embeddings WHERE key IN (SELECT value FROM json_each(?))",
+                (key_list,),
+            ).fetchall()
+            if rows:
+                found_keys = json.dumps([row[0] for row in rows])
+                self._conn.execute(
+                    "UPDATE embeddings SET last_used = ? WHERE key IN (SELECT value FROM json_each(?))",
+                    (time.time(), found_keys),
+                )
+            hit_keys = {row[0] for row in rows}
+            hits = sum(1 for key in keys if key in hit_keys)
+            self.hits += hits
+            self.misses += len(keys) - hits
+
+        found = {key: np.frombuffer(blob, dtype=self.dtype).astype(np.float32) for key, blob in rows}
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model_name: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> np.ndarray:
+        """
+        Stores `vectors` and returns them as later lookups will (rounded to the cache
+        dtype, as float32), so callers hand out the same values on hits and misses.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        stored = np.asarray(vectors, dtype=self.dtype).reshape(len(texts), -1)
+        now = time.time()
+        rows = [(self.key(model_name, text), vector.tobytes(), now) for text, vector in zip(texts, stored)]
+        keys = {row[0] for row in rows}
+        with self._lock:
+            self._conn.execute("BEGIN")
+            # The entry count is kept in memory; only keys new to the table grow it.
+            existing = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE key IN (SELECT value FROM json_each(?))",
+                (json.dumps(sorted(keys)),),
+            ).fetchone()[0]
+            self._conn.executemany(
+                "INSERT INTO embeddings (key, vector, last_used) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET vector = excluded.vector, last_used = excluded.last_used",
+                rows,
+            )
+            self._conn.execute("COMMIT")
+            self._count += len(keys) - existing
+            if self._count > self.max_entries:
+                self._evict(self._count - self.max_entries)
+        return stored.astype(np.float32)
+
+    def _evict(self, overflow: int) -> None:
+        # Evict a little extra so a full cache does not pay for eviction on every write.
+        to_delete = overflow + self.max_entries // 10
+        cursor = self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+            (to_delete,),
+        )
+        self._count -= cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, hits, misses = self._count, self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "dtype": np.dtype(self.dtype).name,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    global _cache
+    if not settings.embedding_cache_enabled:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache(
+                path=os.path.join(settings.cache_dir, "embeddings.sqlite3"),
+                max_entries=settings.embedding_cache_max_entries,
+                dtype=settings.embedding_cache_dtype,
+            )
+        return _cache
+
+
+def embedding_cache_stats() -> Optional[dict]:
+    return _cache.stats() if _cache is not None else None
@@ -2,42 +2,78 @@ from __future__ import annotations
 
 from typing import Optional
 
+import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+from app.embeddings.cache import EmbeddingCache, get_embedding_cache
+from app.embeddings.registry import get_embedding_model
+
 
 class BGEEmbedder:
     """
     Uses sentence-transformers BGE when available.
     Falls back to TF-IDF vectors when sentence-transformers is not installed.
+
+    The transformer weights come from the process-wide registry and are shared by
+    every instance; the TF-IDF vectorizer is fit per instance, so create one
+    embedder per corpus. Transformer vectors go through the embedding cache;
+    TF-IDF vectors depend on the corpus and are never cached.
+
+    Vectors are returned as float32 NumPy arrays (one row per text).
     """
 
-    def __init__(self, model_name: str) -> None:
+    def __init__(self, model_name: str, cache: Optional[EmbeddingCache] = None) -> None:
         self.model_name = model_name
-        self._st_model = None
+        self._st_model = get_embedding_model(model_name)
         self._vectorizer: Optional[TfidfVectorizer] = None
+        self._cache = cache
+        if self._cache is None and self._st_model is not None:
+            self._cache = get_embedding_cache()
 
-        try:
-            from sentence_transformers import SentenceTransformer
+    @property
+    def uses_transformer(self) -> bool:
+        return self._st_model is not None
+
+    @property
+    def dimension(self) -> Optional[int]:
+        # Known up front for the transformer; TF-IDF width is only known after fitting.
+        if self._st_model is not None:
+            return self._st_model.get_sentence_embedding_dimension()
+        return None
 
-            self._st_model = SentenceTransformer(model_name)
-        except Exception:
-            self._st_model = None
+    def _encode(self, texts: list[str]) -> np.ndarray:
+        if self._cache is None:
+            return np.asarray(self._st_model.encode(texts, normalize_embeddings=True), dtype=np.float32)
 
-    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        cached = self._cache.get_many(self.model_name, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None))
+        if missing:
+            encoded = self._st_model.encode(missing, normalize_embeddings=True)
+            # Use the stored (cache-dtype) values so a text embeds identically on hits and misses.
+            fresh = dict(zip(missing, self._cache.put_many(self.model_name, missing, encoded)))
+            cached = [vector if vector is not None else fresh[text] for text, vector in zip(texts, cached)]
+
+        return np.asarray(cached, dtype=np.float32)
+
+    def embed_texts(self, texts: list[str]) -> np.ndarray:
         if self._st_model is not None:
-            vectors = self._st_model.encode(texts, normalize_embeddings=True)
-            return [vec.tolist() for vec in vectors]
+            return self._encode(texts)
 
         self._vectorizer = TfidfVectorizer(max_features=1024)
         matrix = self._vectorizer.fit_transform(texts)
-        return matrix.toarray().tolist()
+        return matrix.toarray().astype(np.float32)
+
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embed_queries([query])[0]
+
+    def embed_queries(self, queries: list[str]) -> np.ndarray:
+        if not queries:
+            return np.zeros((0, self.dimension or 0), dtype=np.float32)
 
-    def embed_query(self, query: str) -> list[float]:
         if self._st_model is not None:
-            vector = self._st_model.encode([query], normalize_embeddings=True)[0]
-            return vector.tolist()
+            return self._encode(queries)
 
         if self._vectorizer is None:
             raise RuntimeError("Vectorizer not fit. Call embed_texts before embed_query.")
 
-        return self._vectorizer.transform([query]).toarray()[0].tolist()
+        return self._vectorizer.transform(queries).toarray().astype(np.float32)
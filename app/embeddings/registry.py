@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Optional
+
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger("venturelens.embeddings")
+
+_models: dict[str, Optional[Any]] = {}
+_lock = threading.Lock()
+
+
+def _load_model(model_name: str) -> Optional[Any]:
+    try:
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(model_name)
+    except Exception:
+        return None
+
+
+def get_embedding_model(model_name: str) -> Optional[Any]:
+    """
+    Returns the process-wide SentenceTransformer for `model_name`, loading it on first use.
+    Returns None when sentence-transformers (or the model weights) are unavailable.
+    """
+    if model_name in _models:
+        return _models[model_name]
+
+    with _lock:
+        if model_name not in _models:
+            model = _load_model(model_name)
+            _models[model_name] = model
+            logger.info(
+                "embedding_model_loaded model=%s backend=%s",
+                model_name,
+                "sentence_transformers" if model is not None else "tfidf",
+            )
+        return _models[model_name]
+
+
+def preload_embedding_model(model_name: str) -> bool:
+    return get_embedding_model(model_name) is not None
+
+
+def clear_embedding_models() -> None:
+    with _lock:
+        _models.clear()
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from app.config.settings import get_settings
+from app.models.schemas import SourceDocument
+from app.utils.executors import run_blocking
+from app.utils.logger import setup_logger
+
+
+settings = get_settings()
+logger = setup_logger("venturelens.http_cache")
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    content: bytes
+    encoding: str
+    body_hash: str
+    # "fetched" (200), "revalidated" (304), "fresh" (served within TTL without a request)
+    # or "stale" (revalidation failed, cached body served)
+    status: str
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+@dataclass
+class _Entry:
+    etag: str
+    last_modified: str
+    fetched_at: float
+    encoding: str
+    body_hash: str
+    content: bytes
+
+
+class HttpCache:
+    """
+    Size-bounded HTTP cache for ingestion sources.
+    Stores bodies with their ETag/Last-Modified validators in SQLite, serves them
+    without a request inside the per-source-type TTL and revalidates with
+    If-None-Match/If-Modified-Since afterwards; if revalidation fails the stale
+    body is served. Parsed documents are stored per body hash so a 304 also skips
+    re-parsing.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: dict[str, float]) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, etag TEXT NOT NULL, last_modified TEXT NOT NULL, "
+            "fetched_at REAL NOT NULL, last_used REAL NOT NULL, encoding TEXT NOT NULL, "
+            "body_hash TEXT NOT NULL, size INTEGER NOT NULL, body BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parsed ("
+            "url TEXT NOT NULL, parse_key TEXT NOT NULL, body_hash TEXT NOT NULL, docs TEXT NOT NULL, "
+            "PRIMARY KEY (url, parse_key))"
+        )
+
+    def _load(self, url: str) -> Optional[_Entry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, fetched_at, encoding, body_hash, body FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE url = ?", (time.time(), url))
+        return _Entry(*row)
+
+    def _store(self, url: str, response: httpx.Response) -> CachedResponse:
+        content = response.content
+        body_hash = hashlib.sha256(content).hexdigest()
+        encoding = response.encoding or "utf-8"
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(url, etag, last_modified, fetched_at, last_used, encoding, body_hash, size, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    response.headers.get("etag", ""),
+                    response.headers.get("last-modified", ""),
+                    now,
+                    now,
+                    encoding,
+                    body_hash,
+                    len(content),
+                    content,
+                ),
+            )
+            self._conn.execute("DELETE FROM parsed WHERE url = ? AND body_hash != ?", (url, body_hash))
+            self._conn.execute("COMMIT")
+            self._evict()
+        return CachedResponse(url=url, content=content, encoding=encoding, body_hash=body_hash, status="fetched")
+
+    def _touch(self, url: str, response: httpx.Response, entry: _Entry) -> None:
+        # A 304 may carry refreshed validators; keep whichever we have.
+        etag = response.headers.get("etag", entry.etag)
+        last_modified = response.headers.get("last-modified", entry.last_modified)
+        with self._lock:
+            self._conn.execute(
+                "UPDATE responses SET fetched_at = ?, etag = ?, last_modified = ? WHERE url = ?",
+                (time.time(), etag, last_modified, url),
+            )
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self._conn.execute("SELECT url, size FROM responses ORDER BY last_used").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE url = ?", (url,))
+            self._conn.execute("DELETE FROM parsed WHERE url = ?", (url,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def get_parsed(self, url: str, parse_key: str, body_hash: str) -> Optional[list[SourceDocument]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT docs FROM parsed WHERE url = ? AND parse_key = ? AND body_hash = ?",
+                (url, parse_key, body_hash),
+            ).fetchone()
+        if row is None:
+            return None
+        return [SourceDocument(**doc) for doc in json.loads(row[0])]
+
+    def put_parsed(self, url: str, parse_key: str, body_hash: str, docs: list[SourceDocument]) -> None:
+        payload = json.dumps([doc.model_dump() for doc in docs])
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO parsed (url, parse_key, body_hash, docs) VALUES (?, ?, ?, ?)",
+                (url, parse_key, body_hash, payload),
+            )
+
+    async def fetch(self, client: httpx.AsyncClient, url: str, source_type: str) -> CachedResponse:
+        entry = await run_blocking(self._load, url)
+        if entry is not None:
+            def cached(status: str) -> CachedResponse:
+                return CachedResponse(
+                    url=url,
+                    content=entry.content,
+                    encoding=entry.encoding,
+                    body_hash=entry.body_hash,
+                    status=status,
+                )
+
+            if time.time() - entry.fetched_at < self.ttl_seconds.get(source_type, 0.0):
+                return cached("fresh")
+
+            headers = {}
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+            try:
+                response = await client.get(url, headers=headers)
+            except httpx.HTTPError as exc:
+                logger.warning("http_cache_serving_stale url=%s error=%s", url, exc)
+                return cached("stale")
+            if response.status_code == 304:
+                await run_blocking(self._touch, url, response, entry)
+                return cached("revalidated")
+            if response.is_error:
+                logger.warning("http_cache_serving_stale url=%s status=%s", url, response.status_code)
+                return cached("stale")
+        else:
+            response = await client.get(url)
+
+        response.raise_for_status()
+        return await run_blocking(self._store, url, response)
+
+
+_cache: Optional[HttpCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_http_cache() -> Optional[HttpCache]:
+    global _cache
+    if not settings.http_cache_enabled:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(
+                path=os.path.join(settings.cache_dir, "http_cache.sqlite3"),
+                max_bytes=settings.http_cache_max_bytes,
+                ttl_seconds={
+                    "website": settings.http_cache_ttl_website_seconds,
+                    "news": settings.http_cache_ttl_news_seconds,
+                    "pdf": settings.http_cache_ttl_pdf_seconds,
+                },
+            )
+        return _cache
+
+
+def _restamp(docs: list[SourceDocument]) -> list[SourceDocument]:
+    # Parsers stamp documents with the retrieval date; a reused parse must not keep the first one.
+    today = str(date.today())
+    for doc in docs:
+        if "date" in doc.metadata:
+            doc.metadata["date"] = today
+    return docs
+
+
+async def fetch_documents(
+    client: httpx.AsyncClient,
+    url: str,
+    source_type: str,
+    parse: Callable[[CachedResponse], Awaitable[list[SourceDocument]]],
+    parse_key: str = "",
+    cache: Optional[HttpCache] = None,
+) -> list[SourceDocument]:
+    """
+    Fetches `url` through the HTTP cache and parses it, reusing the stored parse
+    when the body is unchanged. Without a cache this is a plain GET + parse.
+    """
+    cache = cache or get_http_cache()
+    if cache is None:
+        response = await client.get(url)
+        response.raise_for_status()
+        return await parse(
+            CachedResponse(
+                url=url,
+                content=response.content,
+                encoding=response.encoding or "utf-8",
+                body_hash="",
+                status="fetched",
+            )
+        )
+
+    cached = await cache.fetch(client, url, source_type)
+    if cached.status != "fetched":
+        docs = await run_blocking(cache.get_parsed, url, parse_key, cached.body_hash)
+        if docs is not None:
+            logger.info("http_cache_hit type=%s status=%s url=%s", source_type, cached.status, url)
+            return _restamp(docs)
+
+    docs = await parse(cached)
+    await run_blocking(cache.put_parsed, url, parse_key, cached.body_hash, docs)
+    return docs
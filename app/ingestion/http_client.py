@@ -0,0 +1,53 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.config.settings import get_settings
+from app.utils.logger import setup_logger
+
+
+settings = get_settings()
+logger = setup_logger("venturelens.http")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Builds the pooled async client shared by all ingestion modules.
+    HTTP/2 is only enabled when requested and the `h2` package is installed.
+    """
+    http2 = settings.http2_enabled and _http2_available()
+    if settings.http2_enabled and not http2:
+        logger.warning("http2_disabled reason=h2_not_installed")
+
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry_seconds,
+    )
+    return httpx.AsyncClient(
+        timeout=settings.request_timeout_seconds,
+        follow_redirects=True,
+        verify=settings.request_verify_ssl,
+        limits=limits,
+        http2=http2,
+    )
+
+
+@asynccontextmanager
+async def use_client(client: Optional[httpx.AsyncClient] = None) -> AsyncIterator[httpx.AsyncClient]:
+    # Callers outside the API lifespan (scripts, tests) get a short-lived client instead.
+    if client is not None:
+        yield client
+        return
+
+    async with create_http_client() as temp_client:
+        yield temp_client
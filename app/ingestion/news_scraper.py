@@ -1,32 +1,36 @@
 from datetime import date
+from typing import Optional
 from urllib.parse import quote_plus
 from xml.etree import ElementTree as ET
 
 import httpx
 
-from app.config.settings import get_settings
+from app.ingestion.http_cache import CachedResponse, fetch_documents
+from app.ingestion.http_client import use_client
 from app.models.schemas import SourceDocument
+from app.utils.executors import run_cpu
 
 
-settings = get_settings()
-
-
-async def scrape_news(startup_name: str, max_articles: int = 5) -> list[SourceDocument]:
+async def scrape_news(
+    startup_name: str,
+    max_articles: int = 5,
+    client: Optional[httpx.AsyncClient] = None,
+) -> list[SourceDocument]:
     if max_articles <= 0:
         return []
 
     query = quote_plus(f"{startup_name} startup")
     rss_url = f"https://news.google.com/rss/search?q={query}&hl=en-US&gl=US&ceid=US:en"
 
-    async with httpx.AsyncClient(
-        timeout=settings.request_timeout_seconds,
-        follow_redirects=True,
-        verify=settings.request_verify_ssl,
-    ) as client:
-        response = await client.get(rss_url)
-        response.raise_for_status()
+    async def parse(response: CachedResponse) -> list[SourceDocument]:
+        return await run_cpu(_parse_feed, response.text, startup_name, max_articles)
+
+    async with use_client(client) as http:
+        return await fetch_documents(http, rss_url, "news", parse, parse_key=str(max_articles))
+
 
-    root = ET.fromstring(response.text)
+def _parse_feed(feed: str, startup_name: str, max_articles: int) -> list[SourceDocument]:
+    root = ET.fromstring(feed)
     items = root.findall(".//item")[:max_articles]
 
     docs: list[SourceDocument] = []
@@ -1,45 +1,40 @@
 from datetime import date
-from tempfile import NamedTemporaryFile
+from io import BytesIO
+from typing import Optional
 
 import httpx
 from pypdf import PdfReader
 
-from app.config.settings import get_settings
+from app.ingestion.http_cache import CachedResponse, fetch_documents
+from app.ingestion.http_client import use_client
 from app.models.schemas import SourceDocument
-
-
-settings = get_settings()
-
-
-async def parse_public_pdf(url: str) -> list[SourceDocument]:
-    async with httpx.AsyncClient(
-        timeout=settings.request_timeout_seconds,
-        follow_redirects=True,
-        verify=settings.request_verify_ssl,
-    ) as client:
-        response = await client.get(url)
-        response.raise_for_status()
-
-    with NamedTemporaryFile(suffix=".pdf") as temp_file:
-        temp_file.write(response.content)
-        temp_file.flush()
-
-        reader = PdfReader(temp_file.name)
-        texts: list[str] = []
-        for page in reader.pages:
-            page_text = page.extract_text() or ""
-            if page_text.strip():
-                texts.append(page_text.strip())
-
-    content = "\n".join(texts)
-    if not content:
-        return []
-
-    return [
-        SourceDocument(
-            source=url,
-            type="pitch_deck_pdf",
-            content=content,
-            metadata={"date": str(date.today()), "category": "pdf"},
-        )
-    ]
+from app.utils.executors import run_cpu
+
+
+async def parse_public_pdf(url: str, client: Optional[httpx.AsyncClient] = None) -> list[SourceDocument]:
+    async def parse(response: CachedResponse) -> list[SourceDocument]:
+        content = await run_cpu(_extract_pdf_text, response.content)
+        if not content:
+            return []
+
+        return [
+            SourceDocument(
+                source=url,
+                type="pitch_deck_pdf",
+                content=content,
+                metadata={"date": str(date.today()), "category": "pdf"},
+            )
+        ]
+
+    async with use_client(client) as http:
+        return await fetch_documents(http, url, "pdf", parse)
+
+
+def _extract_pdf_text(data: bytes) -> str:
+    reader = PdfReader(BytesIO(data))
+    texts: list[str] = []
+    for page in reader.pages:
+        page_text = page.extract_text() or ""
+        if page_text.strip():
+            texts.append(page_text.strip())
+    return "\n".join(texts)
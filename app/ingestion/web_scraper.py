@@ -1,26 +1,26 @@
 from datetime import date
+from typing import Optional
 from urllib.parse import urlparse
 
 import httpx
 from bs4 import BeautifulSoup
 
-from app.config.settings import get_settings
+from app.ingestion.http_cache import CachedResponse, fetch_documents
+from app.ingestion.http_client import use_client
 from app.models.schemas import SourceDocument
+from app.utils.executors import run_cpu
 
 
-settings = get_settings()
+async def scrape_website(url: str, client: Optional[httpx.AsyncClient] = None) -> list[SourceDocument]:
+    async def parse(response: CachedResponse) -> list[SourceDocument]:
+        return await run_cpu(_parse_website, response.text, url)
 
+    async with use_client(client) as http:
+        return await fetch_documents(http, url, "website", parse)
 
-async def scrape_website(url: str) -> list[SourceDocument]:
-    async with httpx.AsyncClient(
-        timeout=settings.request_timeout_seconds,
-        follow_redirects=True,
-        verify=settings.request_verify_ssl,
-    ) as client:
-        response = await client.get(url)
-        response.raise_for_status()
 
-    soup = BeautifulSoup(response.text, "html.parser")
+def _parse_website(html: str, url: str) -> list[SourceDocument]:
+    soup = BeautifulSoup(html, "html.parser")
 
     for tag in soup(["script", "style", "noscript"]):
         tag.decompose()
@@ -1,4 +1,4 @@
-from datetime import date
+from datetime import date, datetime
 from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field, HttpUrl
@@ -16,6 +16,7 @@ class SourceDocument(BaseModel):
     type: str
     content: str
     metadata: Dict[str, Any] = Field(default_factory=dict)
+    id: Optional[str] = None
 
 
 class RetrievedEvidence(BaseModel):
@@ -51,11 +52,24 @@ class EvaluationMetrics(BaseModel):
     judge_verdict: str
 
 
+class SourceStatus(BaseModel):
+    source: str
+    type: str
+    status: str
+    documents: int = Field(default=0, ge=0)
+    latency_ms: int = Field(ge=0)
+    error: Optional[str] = None
+
+
 class RunMetrics(BaseModel):
     latency_ms: int = Field(ge=0)
     input_characters: int = Field(ge=0)
     estimated_input_tokens: int = Field(ge=0)
     estimated_cost_usd: float = Field(ge=0.0)
+    stage_timings_ms: Dict[str, int] = Field(default_factory=dict)
+    indexing_points_per_second: float = Field(default=0.0, ge=0.0)
+    duplicates_removed: int = Field(default=0, ge=0)
+    embedding_ms_saved: int = Field(default=0, ge=0)
 
 
 class AnalyzeStartupResponse(BaseModel):
@@ -64,4 +78,36 @@ class AnalyzeStartupResponse(BaseModel):
     evaluation: EvaluationMetrics
     metrics: RunMetrics
     sources_indexed: int
+    sources: List[SourceStatus] = Field(default_factory=list)
+    cached: bool = False
+    cache_age_seconds: Optional[float] = None
     notes: Optional[str] = None
+
+
+class BatchAnalyzeRequest(BaseModel):
+    items: List[AnalyzeStartupRequest] = Field(min_length=1)
+    concurrency: Optional[int] = Field(default=None, ge=1, le=32)
+
+
+class BatchAnalyzeResult(BaseModel):
+    index: int
+    startup_name: str
+    status: str
+    response: Optional[AnalyzeStartupResponse] = None
+    error: Optional[str] = None
+
+
+class AnalysisJob(BaseModel):
+    job_id: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    current_stage: Optional[str] = None
+    stage_timings_ms: Dict[str, int] = Field(default_factory=dict)
+    indexing_points_per_second: float = Field(default=0.0, ge=0.0)
+    duplicates_removed: int = Field(default=0, ge=0)
+    embedding_ms_saved: int = Field(default=0, ge=0)
+    sources: List[SourceStatus] = Field(default_factory=list)
+    result: Optional[AnalyzeStartupResponse] = None
+    error: Optional[str] = None
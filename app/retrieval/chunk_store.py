@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from app.models.schemas import SourceDocument
+
+
+class ChunkStore:
+    """
+    Columnar chunk storage used between chunking and retrieval. Chunks are rows of
+    parallel arrays (parent document, source id, type id, character offsets, chunk
+    index) plus their point ids. Text is sliced from the parent on demand, and
+    metadata is shared per parent, with sparse per-chunk overrides. Pydantic models
+    are only built at the API boundary (`to_source_documents`).
+    """
+
+    __slots__ = (
+        "parents",
+        "sources",
+        "types",
+        "parent",
+        "source_ids",
+        "type_ids",
+        "starts",
+        "ends",
+        "chunk_index",
+        "chunk_count",
+        "ids",
+        "_extra",
+        "_annotate",
+    )
+
+    def __init__(
+        self,
+        parents: Sequence[SourceDocument],
+        parent: np.ndarray,
+        starts: np.ndarray,
+        ends: np.ndarray,
+        chunk_index: np.ndarray,
+        ids: list[str],
+        chunk_count: Optional[np.ndarray] = None,
+        extra: Optional[dict[int, dict]] = None,
+        annotate: bool = True,
+    ) -> None:
+        self.parents = list(parents)
+        self.parent = np.asarray(parent, dtype=np.int32)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.chunk_index = np.asarray(chunk_index, dtype=np.int32)
+        self.ids = ids
+        if chunk_count is None:
+            chunk_count = np.bincount(self.parent, minlength=len(self.parents))[self.parent] if len(self.parent) else self.parent
+        self.chunk_count = np.asarray(chunk_count, dtype=np.int32)
+        self._extra = extra or {}
+        # Whether metadata(i) adds chunk_index/chunk_count (False for records that are already whole chunks).
+        self._annotate = annotate
+
+        self.sources: list[str] = list(dict.fromkeys(doc.source for doc in self.parents))
+        self.types: list[str] = list(dict.fromkeys(doc.type for doc in self.parents))
+        source_lookup = {source: i for i, source in enumerate(self.sources)}
+        type_lookup = {doc_type: i for i, doc_type in enumerate(self.types)}
+        parent_sources = np.asarray([source_lookup[doc.source] for doc in self.parents], dtype=np.int32)
+        parent_types = np.asarray([type_lookup[doc.type] for doc in self.parents], dtype=np.int32)
+        self.source_ids = parent_sources[self.parent] if len(self.parent) else self.parent.copy()
+        self.type_ids = parent_types[self.parent] if len(self.parent) else self.parent.copy()
+
+    @classmethod
+    def from_records(cls, records: Sequence[dict]) -> "ChunkStore":
+        """Wraps already-chunked records (dicts with id/source/type/content/metadata), one parent each."""
+        parents = [
+            SourceDocument(
+                source=r.get("source", "unknown"),
+                type=r.get("type", ""),
+                content=r.get("content", ""),
+                metadata=r.get("metadata", {}),
+            )
+            for r in records
+        ]
+        count = len(parents)
+        return cls(
+            parents,
+            parent=np.arange(count),
+            starts=np.zeros(count),
+            ends=np.asarray([len(doc.content) for doc in parents]),
+            chunk_index=np.zeros(count),
+            ids=[str(r.get("id", "")) for r in records],
+            chunk_count=np.ones(count),
+            annotate=False,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def text(self, i: int) -> str:
+        return self.parents[self.parent[i]].content[self.starts[i] : self.ends[i]]
+
+    def texts(self) -> list[str]:
+        return [self.text(i) for i in range(len(self))]
+
+    def total_characters(self) -> int:
+        return int((self.ends - self.starts).sum())
+
+    def source(self, i: int) -> str:
+        return self.sources[self.source_ids[i]]
+
+    def type(self, i: int) -> str:
+        return self.types[self.type_ids[i]]
+
+    def metadata_value(self, i: int, key: str) -> Any:
+        extra = self._extra.get(i)
+        if extra is not None and key in extra:
+            return extra[key]
+        if self._annotate and key == "chunk_index":
+            return int(self.chunk_index[i])
+        if self._annotate and key == "chunk_count":
+            return int(self.chunk_count[i])
+        return self.parents[self.parent[i]].metadata.get(key)
+
+    def metadata(self, i: int) -> dict:
+        metadata = dict(self.parents[self.parent[i]].metadata)
+        if self._annotate:
+            metadata["chunk_index"] = int(self.chunk_index[i])
+            metadata["chunk_count"] = int(self.chunk_count[i])
+        metadata.update(self._extra.get(i, {}))
+        return metadata
+
+    def set_metadata(self, i: int, key: str, value: Any) -> None:
+        self._extra.setdefault(i, {})[key] = value
+
+    def payload(self, i: int) -> dict:
+        return {"source": self.source(i), "type": self.type(i), "content": self.text(i), "metadata": self.metadata(i)}
+
+    def select(self, positions: Sequence[int]) -> "ChunkStore":
+        """A store over a subset of rows, sharing parents (and parent metadata) with this one."""
+        positions = np.asarray(positions, dtype=np.int64)
+        remap = {int(old): new for new, old in enumerate(positions)}
+        return ChunkStore(
+            self.parents,
+            parent=self.parent[positions],
+            starts=self.starts[positions],
+            ends=self.ends[positions],
+            chunk_index=self.chunk_index[positions],
+            ids=[self.ids[i] for i in positions],
+            chunk_count=self.chunk_count[positions],
+            extra={remap[i]: values for i, values in self._extra.items() if i in remap},
+            annotate=self._annotate,
+        )
+
+    def to_source_documents(self) -> list[SourceDocument]:
+        return [
+            SourceDocument(source=self.source(i), type=self.type(i), content=self.text(i), metadata=self.metadata(i), id=self.ids[i])
+            for i in range(len(self))
+        ]
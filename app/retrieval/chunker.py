@@ -1,44 +1,192 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+from itertools import chain
+from typing import Any, Iterable, Iterator, Optional, Sequence
+from uuid import NAMESPACE_URL, uuid5
+
+import numpy as np
+
+from app.embeddings.registry import get_embedding_model
 from app.models.schemas import SourceDocument
+from app.retrieval.chunk_store import ChunkStore
+
+
+# Word/punctuation tokens; a fast stand-in when the model's tokenizer is unavailable.
+_APPROX_TOKEN = re.compile(r"\w+|[^\w\s]")
+# Word-level tokens undercount WordPiece tokens, so approximate budgets are scaled down
+# to keep chunks under the model limit.
+_APPROX_SAFETY = 0.8
+_NEWLINE = re.compile(r"\n")
+_SENTENCE_PUNCT = re.compile(r"[.!?]")
+_SPACE = re.compile(r"\s")
+# Budget when the model is unknown (TF-IDF fallback): roughly the old 800-character chunks.
+DEFAULT_MAX_TOKENS = 200
+
+
+def chunk_id(source: str, chunk_index: int, content: str, namespace: str = "") -> str:
+    # Stable across runs, so re-indexing the same chunk overwrites its point instead of duplicating it.
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return str(uuid5(NAMESPACE_URL, f"{namespace}\x1f{source}\x1f{chunk_index}\x1f{digest}"))
+
+
+class ChunkTokenizer:
+    """
+    Character spans of tokens, from the embedding model's fast tokenizer when available
+    and a regex approximation otherwise. `max_tokens` is the per-chunk budget the model
+    can encode without truncation.
+    """
+
+    def __init__(self, hf_tokenizer: Any = None, max_tokens: int = DEFAULT_MAX_TOKENS) -> None:
+        self._tokenizer = hf_tokenizer
+        self.exact = hf_tokenizer is not None
+        self.max_tokens = max_tokens if self.exact else max(1, int(max_tokens * _APPROX_SAFETY))
+
+    def spans(self, text: str) -> np.ndarray:
+        if self._tokenizer is not None:
+            encoded = self._tokenizer(
+                text,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+                verbose=False,
+            )
+            offsets = [pair for pair in encoded["offset_mapping"] if pair[1] > pair[0]]
+            return np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+        flat = np.fromiter(chain.from_iterable(m.span() for m in _APPROX_TOKEN.finditer(text)), dtype=np.int64)
+        return flat.reshape(-1, 2)
+
+
+def chunk_tokenizer_for(model_name: str, max_tokens: int = 0) -> ChunkTokenizer:
+    """
+    Tokenizer and budget for `model_name`. `max_tokens=0` means the model's own
+    sequence limit minus its two special tokens.
+    """
+    model = get_embedding_model(model_name)
+    hf_tokenizer = getattr(model, "tokenizer", None) if model is not None else None
+    if hf_tokenizer is None or not getattr(hf_tokenizer, "is_fast", False):
+        return ChunkTokenizer(None, max_tokens or DEFAULT_MAX_TOKENS)
+
+    model_limit = int(getattr(model, "max_seq_length", 0) or 512) - 2
+    return ChunkTokenizer(hf_tokenizer, min(max_tokens, model_limit) if max_tokens else model_limit)
 
 
-def chunk_text(text: str, max_chunk_size: int, overlap: int) -> list[str]:
-    text = text.strip()
-    if not text:
-        return []
+@dataclass(frozen=True)
+class ChunkRef:
+    """A chunk as character offsets into its parent document; text is sliced on demand."""
 
-    if max_chunk_size <= 0:
-        return [text]
+    __slots__ = ("doc", "start", "end", "chunk_index", "tokens")
 
-    chunks: list[str] = []
-    start = 0
-    text_len = len(text)
+    doc: SourceDocument
+    start: int
+    end: int
+    chunk_index: int
+    tokens: int
 
-    while start < text_len:
-        end = min(start + max_chunk_size, text_len)
-        chunks.append(text[start:end].strip())
-        if end >= text_len:
-            break
-        start = max(0, end - overlap)
+    @property
+    def text(self) -> str:
+        return self.doc.content[self.start : self.end]
 
-    return [c for c in chunks if c]
 
+def _positions(pattern: re.Pattern, text: str) -> np.ndarray:
+    return np.fromiter((m.start() for m in pattern.finditer(text)), dtype=np.int64)
+
+
+def _line_break_after(text: str, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # True for tokens followed by a line break before the next token (or by the end of the text).
+    newlines = _positions(_NEWLINE, text)
+    next_starts = np.append(starts[1:], len(text) + 1)
+    between = np.searchsorted(newlines, next_starts) - np.searchsorted(newlines, ends)
+    return (between > 0) | (next_starts > len(text))
+
+
+def _last_marked(mask: np.ndarray) -> np.ndarray:
+    # For each token k, the largest index <= k where `mask` is set (-1 if none).
+    return np.maximum.accumulate(np.where(mask, np.arange(len(mask)), -1))
+
+
+def iter_chunks(docs: Iterable[SourceDocument], tokenizer: ChunkTokenizer, overlap_tokens: int = 32) -> Iterator[ChunkRef]:
+    """
+    Lazily splits documents into chunks of at most `tokenizer.max_tokens` tokens.
+    A chunk ends at the last paragraph break in the second half of its window, else
+    the last sentence end, else the window edge; consecutive chunks share up to
+    `overlap_tokens` tokens, starting on a sentence boundary when one is available.
+    """
+    max_tokens = max(1, tokenizer.max_tokens)
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
 
-def chunk_documents(docs: list[SourceDocument], max_chunk_size: int, overlap: int) -> list[SourceDocument]:
-    chunked: list[SourceDocument] = []
     for doc in docs:
-        pieces = chunk_text(doc.content, max_chunk_size=max_chunk_size, overlap=overlap)
-        if not pieces:
+        text = doc.content
+        spans = tokenizer.spans(text)
+        count = len(spans)
+        if not count:
             continue
-        for idx, piece in enumerate(pieces):
-            metadata = dict(doc.metadata)
-            metadata["chunk_index"] = idx
-            metadata["chunk_count"] = len(pieces)
-            chunked.append(
-                SourceDocument(
-                    source=doc.source,
-                    type=doc.type,
-                    content=piece,
-                    metadata=metadata,
-                )
-            )
-    return chunked
+
+        starts, ends = spans[:, 0], spans[:, 1]
+        paragraph_end = _line_break_after(text, starts, ends)
+        sentence_end = paragraph_end | (
+            np.isin(ends - 1, _positions(_SENTENCE_PUNCT, text))
+            & (np.isin(ends, _positions(_SPACE, text)) | (ends == len(text)))
+        )
+        last_paragraph = _last_marked(paragraph_end)
+        last_sentence = _last_marked(sentence_end)
+
+        first, chunk_index = 0, 0
+        while first < count:
+            limit = min(first + max_tokens, count)
+            last = limit - 1
+            if limit < count:
+                floor = first + max_tokens // 2
+                if last_paragraph[last] >= floor:
+                    last = int(last_paragraph[last])
+                elif last_sentence[last] >= floor:
+                    last = int(last_sentence[last])
+
+            yield ChunkRef(doc, int(starts[first]), int(ends[last]), chunk_index, last - first + 1)
+            chunk_index += 1
+            if last + 1 >= count:
+                break
+
+            following = last + 1
+            resume = max(first + 1, following - overlap_tokens)
+            if overlap_tokens:
+                # Start the overlap at a sentence start inside it when there is one.
+                boundary = last_sentence[last - 1] if last > 0 else -1
+                if boundary + 1 >= resume:
+                    resume = int(boundary) + 1
+            first = min(resume, following)
+
+
+def build_chunk_store(
+    docs: Sequence[SourceDocument],
+    tokenizer: Optional[ChunkTokenizer] = None,
+    overlap_tokens: int = 32,
+    namespace: str = "",
+) -> ChunkStore:
+    """Chunks documents straight into a columnar ChunkStore (no per-chunk objects)."""
+    tokenizer = tokenizer or ChunkTokenizer()
+    positions = {id(doc): i for i, doc in enumerate(docs)}
+    parent: list[int] = []
+    starts: list[int] = []
+    ends: list[int] = []
+    chunk_index: list[int] = []
+    ids: list[str] = []
+    for ref in iter_chunks(docs, tokenizer, overlap_tokens):
+        parent.append(positions[id(ref.doc)])
+        starts.append(ref.start)
+        ends.append(ref.end)
+        chunk_index.append(ref.chunk_index)
+        ids.append(chunk_id(ref.doc.source, ref.chunk_index, ref.text, namespace))
+    return ChunkStore(docs, np.asarray(parent), np.asarray(starts), np.asarray(ends), np.asarray(chunk_index), ids)
+
+
+def chunk_documents(
+    docs: list[SourceDocument],
+    tokenizer: Optional[ChunkTokenizer] = None,
+    overlap_tokens: int = 32,
+    namespace: str = "",
+) -> list[SourceDocument]:
+    return build_chunk_store(docs, tokenizer, overlap_tokens, namespace).to_source_documents()
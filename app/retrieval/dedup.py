@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import re
+import zlib
+from collections import defaultdict
+from typing import Iterable
+
+import numpy as np
+
+from app.retrieval.chunk_store import ChunkStore
+
+
+_WORD = re.compile(r"\w+")
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def _shingles(text: str, size: int = 3) -> np.ndarray:
+    words = _WORD.findall(text.lower())
+    if len(words) > size:
+        grams = (" ".join(words[i : i + size]) for i in range(len(words) - size + 1))
+    else:
+        grams = iter([" ".join(words)])
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64)
+
+
+def _band_layout(num_perm: int, threshold: float) -> tuple[int, int]:
+    # LSH catches pairs above ~(1/bands)^(1/rows); pick the layout closest to (just below) the threshold.
+    layouts = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [layout for layout in layouts if (1 / layout[0]) ** (1 / layout[1]) <= threshold]
+    return max(below or layouts[:1], key=lambda layout: (1 / layout[0]) ** (1 / layout[1]))
+
+
+class MinHashDeduplicator:
+    """
+    Near-duplicate detection with MinHash signatures over word 3-gram shingles and
+    LSH banding, so each text is only compared with the few that share a band
+    (roughly linear time). Texts whose estimated Jaccard similarity with an
+    earlier kept text reaches `threshold` are reported as duplicates.
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, seed: int = 0) -> None:
+        rng = np.random.default_rng(seed)
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self._seeds = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        # Odd multipliers make x -> (x ^ seed) * mult (mod 2^64) a bijection.
+        self._multipliers = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.bands, self.rows = _band_layout(num_perm, threshold)
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = _shingles(text)
+        with np.errstate(over="ignore"):
+            hashed = ((shingles[:, None] ^ self._seeds[None, :]) * self._multipliers[None, :]) & _MASK64
+        return hashed.min(axis=0)
+
+    def duplicates(self, texts: Iterable[str]) -> dict[int, int]:
+        """Maps each duplicate's position to the position of the earlier text it duplicates."""
+        buckets: dict[tuple[int, bytes], list[int]] = defaultdict(list)
+        signatures: dict[int, np.ndarray] = {}
+        found: dict[int, int] = {}
+
+        for position, text in enumerate(texts):
+            signature = self.signature(text)
+            bands = [
+                (band, signature[band * self.rows : (band + 1) * self.rows].tobytes()) for band in range(self.bands)
+            ]
+            candidates = dict.fromkeys(kept for key in bands for kept in buckets.get(key, ()))
+            match = next(
+                (kept for kept in candidates if np.mean(signatures[kept] == signature) >= self.threshold),
+                None,
+            )
+            if match is not None:
+                found[position] = match
+                continue
+
+            signatures[position] = signature
+            for key in bands:
+                buckets[key].append(position)
+        return found
+
+
+def deduplicate_chunks(chunks: ChunkStore, threshold: float = 0.85) -> tuple[ChunkStore, int]:
+    """
+    Drops near-duplicate chunks, keeping the first occurrence; the kept chunk lists the
+    other sources it stood in for under `metadata["duplicate_sources"]`.
+    """
+    duplicates = MinHashDeduplicator(threshold=threshold).duplicates(chunks.text(i) for i in range(len(chunks)))
+    if not duplicates:
+        return chunks, 0
+
+    for position, kept in duplicates.items():
+        source = chunks.source(position)
+        merged = chunks.metadata_value(kept, "duplicate_sources") or []
+        if source != chunks.source(kept) and source not in merged:
+            chunks.set_metadata(kept, "duplicate_sources", [*merged, source])
+    return chunks.select([i for i in range(len(chunks)) if i not in duplicates]), len(duplicates)
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import heapq
+import math
+import os
+import sqlite3
+import threading
+from collections import Counter
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.retrieval.search import tokenize
+
+
+settings = get_settings()
+
+
+class PersistentInvertedIndex:
+    """
+    Disk-backed BM25 inverted index kept alongside the vector store.
+
+    Postings, document lengths and corpus statistics live in SQLite, so chunks
+    can be added or removed incrementally and the index survives restarts.
+    Uses the non-negative BM25 idf, log(1 + (N - df + 0.5) / (df + 0.5)), which
+    keeps per-term score upper bounds valid for MaxScore early termination.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75) -> None:
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (doc_id TEXT PRIMARY KEY, length INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL, doc_id TEXT NOT NULL, tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_doc ON postings(doc_id);
+            CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO stats (key, value) VALUES ('doc_count', 0), ('total_length', 0);
+            CREATE TEMP TABLE scope (doc_id TEXT PRIMARY KEY, ordinal INTEGER NOT NULL) WITHOUT ROWID;
+            """
+        )
+
+    def _stats(self) -> tuple[int, float]:
+        rows = dict(self._conn.execute("SELECT key, value FROM stats").fetchall())
+        doc_count = rows.get("doc_count", 0)
+        avgdl = (rows.get("total_length", 0) / doc_count) if doc_count else 1.0
+        return doc_count, avgdl or 1.0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._stats()[0]
+
+    def _remove(self, doc_ids: Sequence[str]) -> int:
+        removed = 0
+        for doc_id in doc_ids:
+            row = self._conn.execute("SELECT length FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()
+            if row is None:
+                continue
+            terms = [t for (t,) in self._conn.execute("SELECT term FROM postings WHERE doc_id = ?", (doc_id,))]
+            self._conn.executemany("UPDATE terms SET df = df - 1 WHERE term = ?", [(t,) for t in terms])
+            self._conn.execute("DELETE FROM postings WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM docs WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("UPDATE stats SET value = value - 1 WHERE key = 'doc_count'")
+            self._conn.execute("UPDATE stats SET value = value - ? WHERE key = 'total_length'", (row[0],))
+            removed += 1
+        self._conn.execute("DELETE FROM terms WHERE df <= 0")
+        return removed
+
+    def add_documents(self, doc_ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Adds (or replaces) documents without rebuilding the index."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                documents = dict(zip(doc_ids, texts))
+                self._remove(list(documents))
+                total_length = 0
+                for doc_id, text in documents.items():
+                    counts = Counter(tokenize(text))
+                    length = sum(counts.values())
+                    total_length += length
+                    self._conn.execute("INSERT INTO docs (doc_id, length) VALUES (?, ?)", (doc_id, length))
+                    self._conn.executemany(
+                        "INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)",
+                        [(term, doc_id, tf) for term, tf in counts.items()],
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO terms (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                        [(term,) for term in counts],
+                    )
+                self._conn.execute("UPDATE stats SET value = value + ? WHERE key = 'doc_count'", (len(documents),))
+                self._conn.execute("UPDATE stats SET value = value + ? WHERE key = 'total_length'", (total_length,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def remove_documents(self, doc_ids: Sequence[str]) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                removed = self._remove(doc_ids)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return removed
+
+    def _idf(self, df: int, doc_count: int) -> float:
+        return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+    def _query_terms(self, query: str) -> list[tuple[str, int, float]]:
+        """(term, query term count, idf) for query terms present in the index."""
+        counts = Counter(tokenize(query))
+        if not counts:
+            return []
+        doc_count, _ = self._stats()
+        placeholders = ",".join("?" * len(counts))
+        rows = self._conn.execute(f"SELECT term, df FROM terms WHERE term IN ({placeholders})", list(counts)).fetchall()
+        return [(term, counts[term], self._idf(df, doc_count)) for term, df in rows]
+
+    def _load_scope(self, ordinals) -> None:
+        """Replaces the temp `scope` table with (doc_id, ordinal) pairs so queries can join against it."""
+        self._conn.execute("DELETE FROM temp.scope")
+        self._conn.executemany("INSERT OR IGNORE INTO temp.scope (doc_id, ordinal) VALUES (?, ?)", ordinals)
+
+    def _postings(self, term: str, scoped: bool = False) -> list[tuple[str, int, int]]:
+        if not scoped:
+            return self._conn.execute(
+                "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.doc_id = p.doc_id WHERE p.term = ?",
+                (term,),
+            ).fetchall()
+        return self._conn.execute(
+            "SELECT p.doc_id, p.tf, d.length FROM temp.scope s "
+            "JOIN postings p ON p.term = ? AND p.doc_id = s.doc_id JOIN docs d ON d.doc_id = s.doc_id",
+            (term,),
+        ).fetchall()
+
+    def search(self, query: str, top_k: int = 10) -> list[tuple[str, float]]:
+        """
+        Global top-k BM25 search with MaxScore early termination: once the k-th
+        best score beats the best any unseen document could still reach, the
+        remaining terms only rescore existing candidates.
+        """
+        with self._lock:
+            terms = self._query_terms(query)
+            _, avgdl = self._stats()
+            bounds = [count * idf * (self.k1 + 1) for _, count, idf in terms]
+            order = sorted(range(len(terms)), key=lambda i: bounds[i], reverse=True)
+            remaining = sum(bounds)
+            scores: dict[str, float] = {}
+
+            for i in order:
+                term, count, idf = terms[i]
+                threshold = heapq.nlargest(top_k, scores.values())[-1] if len(scores) >= top_k else 0.0
+                candidates_only = len(scores) >= top_k and threshold >= remaining
+                if candidates_only:
+                    self._load_scope((doc_id, 0) for doc_id in scores)
+                postings = self._postings(term, scoped=candidates_only)
+                for doc_id, tf, length in postings:
+                    norm = self.k1 * (1 - self.b + self.b * length / avgdl)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + count * idf * tf * (self.k1 + 1) / (tf + norm)
+                remaining -= bounds[i]
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+
+    def scores_for(self, query: str, ordinals: dict[str, int], size: int) -> np.ndarray:
+        """BM25 scores for one query laid out over a caller-defined corpus (doc_id -> ordinal)."""
+        return self.scores_batch_for([query], ordinals, size)[0]
+
+    def scores_batch_for(self, queries: list[str], ordinals: dict[str, int], size: int) -> np.ndarray:
+        """Like `scores_for` for several queries; only postings of the corpus are read, via a join."""
+        result = np.zeros((len(queries), size), dtype=np.float64)
+        with self._lock:
+            self._load_scope(ordinals.items())
+            _, avgdl = self._stats()
+            for row, query in enumerate(queries):
+                for term, count, idf in self._query_terms(query):
+                    postings = self._conn.execute(
+                        "SELECT s.ordinal, p.tf, d.length FROM temp.scope s "
+                        "JOIN postings p ON p.term = ? AND p.doc_id = s.doc_id JOIN docs d ON d.doc_id = s.doc_id",
+                        (term,),
+                    ).fetchall()
+                    if not postings:
+                        continue
+                    positions, tf, length = np.asarray(postings, dtype=np.float64).T
+                    norm = self.k1 * (1 - self.b + self.b * length / avgdl)
+                    np.add.at(result[row], positions.astype(np.int64), count * idf * tf * (self.k1 + 1) / (tf + norm))
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class PersistentKeywordView:
+    """
+    Exposes a PersistentInvertedIndex with the KeywordIndex interface for one
+    corpus, so HybridRetriever can use it in place of the in-memory index.
+    """
+
+    def __init__(self, index: PersistentInvertedIndex, doc_ids: Sequence[str]) -> None:
+        self.index = index
+        self.corpus_size = len(doc_ids)
+        self._ordinals = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+
+    def scores(self, query: str) -> np.ndarray:
+        return self.index.scores_for(query, self._ordinals, self.corpus_size)
+
+    def scores_batch(self, queries: list[str]) -> np.ndarray:
+        return self.index.scores_batch_for(queries, self._ordinals, self.corpus_size)
+
+
+_index: Optional[PersistentInvertedIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_inverted_index() -> Optional[PersistentInvertedIndex]:
+    global _index
+    if not settings.keyword_index_enabled:
+        return None
+
+    with _index_lock:
+        if _index is None:
+            _index = PersistentInvertedIndex(os.path.join(settings.cache_dir, "keyword_index.sqlite3"))
+        return _index
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """K-means on unit vectors using dot-product similarity; returns normalized centroids."""
+    rng = np.random.default_rng(seed)
+    n_clusters = max(1, min(n_clusters, len(vectors)))
+    centroids = vectors[rng.choice(len(vectors), size=n_clusters, replace=False)].astype(np.float32)
+
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over the rows of a vector matrix: rows are bucketed by
+    nearest k-means centroid and a query only scores the rows of its `nprobe` closest
+    buckets. New rows are assigned to the existing centroids (no retraining) and the
+    bucket layout is rebuilt lazily on the next search.
+    """
+
+    def __init__(self, n_lists: int = 0, nprobe: int = 8) -> None:
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._order: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, sample: np.ndarray, total_size: int) -> None:
+        """Fits centroids on `sample` (drawn from `total_size` rows); callers then `assign` every row."""
+        n_lists = self.n_lists or int(np.clip(np.sqrt(total_size), 1, 4096))
+        self.centroids = spherical_kmeans(np.asarray(sample, dtype=np.float32), n_lists)
+        self.trained_size = total_size
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._order = None
+
+    def assign(self, rows: np.ndarray, vectors: np.ndarray) -> None:
+        """(Re)assigns `rows` (whose current vectors are `vectors`) to their nearest centroid."""
+        if not self.trained or not len(rows):
+            return
+        needed = int(rows.max()) + 1
+        if needed > len(self._assignments):
+            grown = np.zeros(max(needed, 2 * len(self._assignments)), dtype=np.int32)
+            grown[: len(self._assignments)] = self._assignments
+            self._assignments = grown
+        self._assignments[rows] = np.argmax(np.asarray(vectors, dtype=np.float32) @ self.centroids.T, axis=1)
+        self._order = None
+
+    def compact(self, kept_rows: np.ndarray) -> None:
+        """Mirrors a store compaction where row `kept_rows[i]` moved to row `i`."""
+        self._assignments = self._assignments[kept_rows].copy()
+        self._order = None
+
+    def candidates(self, query: np.ndarray, size: int, nprobe: Optional[int] = None) -> np.ndarray:
+        """Rows in the `nprobe` buckets closest to a (normalized) query, among the first `size` rows."""
+        if self._order is None or len(self._order) != size:
+            assignments = self._assignments[:size]
+            self._order = np.argsort(assignments, kind="stable")
+            self._offsets = np.searchsorted(assignments[self._order], np.arange(len(self.centroids) + 1))
+
+        nprobe = min(len(self.centroids), max(1, nprobe or self.nprobe))
+        similarities = self.centroids @ query
+        probes = np.argpartition(-similarities, nprobe - 1)[:nprobe] if nprobe < len(self.centroids) else np.arange(len(self.centroids))
+        return np.concatenate([self._order[self._offsets[p] : self._offsets[p + 1]] for p in probes])
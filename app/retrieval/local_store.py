@@ -0,0 +1,392 @@
+from __future__ import annotations
+
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.retrieval.ivf import IVFIndex
+
+
+VECTOR_DTYPES = ("float32", "float16", "int8")
+
+# Rows dequantized per matrix product when scanning quantized storage.
+_SCAN_BLOCK_ROWS = 16384
+
+
+@dataclass
+class LocalHit:
+    id: str
+    score: float
+    payload: dict
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class _SpillMatrix:
+    """Growable float32 matrix backed by an unlinked temporary file, so it lives in the page cache, not the heap."""
+
+    def __init__(self, vector_size: int, capacity: int, directory: Optional[str] = None) -> None:
+        self.vector_size = vector_size
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self.array = self._map(capacity)
+
+    def _map(self, capacity: int) -> np.ndarray:
+        self._file.truncate(capacity * self.vector_size * 4)
+        return np.memmap(self._file, dtype=np.float32, mode="r+", shape=(capacity, self.vector_size))
+
+    def resize(self, capacity: int) -> None:
+        self.array.flush()
+        self.array = self._map(capacity)
+
+
+class LocalVectorStore:
+    """
+    In-process cosine vector store: one contiguous, pre-normalized matrix with
+    parallel id/payload lists. Capacity doubles on growth, so upserts are
+    amortized O(1) per point; upserting an existing id overwrites its row.
+
+    `dtype` selects the in-memory representation: float32, float16 (2x smaller) or
+    int8 with a per-vector scale (4x smaller). Quantized matrices are scored block by
+    block; with `rescore=True` full-precision copies are kept in a disk-backed spill
+    file and the top `rescore_factor * top_k` candidates are re-ranked with them.
+
+    With `ann_min_points > 0`, an IVF index is trained once the store reaches that
+    size (and retrained when it has grown 4x since); searches then score only the
+    rows in the `ann_nprobe` closest buckets.
+    """
+
+    def __init__(
+        self,
+        vector_size: int,
+        initial_capacity: int = 1024,
+        ann_min_points: int = 0,
+        ann_nprobe: int = 8,
+        ann_lists: int = 0,
+        dtype: str = "float32",
+        rescore: bool = False,
+        rescore_factor: int = 4,
+    ) -> None:
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype!r}; expected one of {', '.join(VECTOR_DTYPES)}")
+
+        capacity = max(1, initial_capacity)
+        self.vector_size = vector_size
+        self.dtype = dtype
+        self.rescore_factor = max(1, rescore_factor)
+        self.ann_min_points = ann_min_points
+        self._ann: Optional[IVFIndex] = IVFIndex(n_lists=ann_lists, nprobe=ann_nprobe) if ann_min_points > 0 else None
+        self._vectors = np.zeros((capacity, vector_size), dtype=np.dtype(dtype))
+        self._scales = np.ones(capacity, dtype=np.float32) if dtype == "int8" else None
+        self._full = _SpillMatrix(vector_size, capacity) if rescore and dtype != "float32" else None
+        self._size = 0
+        self._ids: list[str] = []
+        self._payloads: list[dict] = []
+        self._rows: dict[str, int] = {}
+        # Reentrant: recall_at_k searches while holding it. Shared stores serve concurrent requests.
+        self._lock = threading.RLock()
+        # (trained_size, recall) of the last `ann_recall` check, redone after each (re)training.
+        self._ann_recall: Optional[tuple[int, float]] = None
+        # Cached filter columns keyed by metadata key; "@"-prefixed keys are top-level payload fields.
+        self._metadata_columns: dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """All stored vectors as float32 (dequantized copy for quantized storage)."""
+        return self._dequantize(slice(0, self._size))
+
+    def _dequantize(self, rows) -> np.ndarray:
+        block = self._vectors[rows].astype(np.float32)
+        if self._scales is not None:
+            block *= self._scales[rows][:, None]
+        return block
+
+    def _quantize(self, rows: np.ndarray, normalized: np.ndarray) -> None:
+        if self._scales is not None:
+            scales = np.abs(normalized).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._vectors[rows] = np.round(normalized / scales[:, None]).astype(np.int8)
+            self._scales[rows] = scales
+        else:
+            self._vectors[rows] = normalized
+        if self._full is not None:
+            self._full.array[rows] = normalized
+
+    def _score_rows(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """(queries x rows) similarities on the stored representation; all rows when `rows` is None."""
+        if rows is not None:
+            return queries @ self._dequantize(rows).T
+        if self.dtype == "float32":
+            return queries @ self._vectors[: self._size].T
+        scores = np.empty((len(queries), self._size), dtype=np.float32)
+        for start in range(0, self._size, _SCAN_BLOCK_ROWS):
+            block = slice(start, min(start + _SCAN_BLOCK_ROWS, self._size))
+            scores[:, block] = queries @ self._dequantize(block).T
+        return scores
+
+    def memory_stats(self) -> dict:
+        with self._lock:
+            vector_bytes = self._vectors.itemsize * self.vector_size + (4 if self._scales is not None else 0)
+            payload_bytes = sum(len(p.get("content", "")) for p in self._payloads)
+            return {
+                "dtype": self.dtype,
+                "points": self._size,
+                "vector_bytes_per_point": vector_bytes,
+                "float32_bytes_per_point": 4 * self.vector_size,
+                "payload_content_bytes_per_point": round(payload_bytes / self._size, 1) if self._size else 0.0,
+                "rescore": self._full is not None,
+            }
+
+    def _reserve(self, capacity: int) -> None:
+        if capacity <= len(self._vectors):
+            return
+        new_capacity = len(self._vectors)
+        while new_capacity < capacity:
+            new_capacity *= 2
+        grown = np.zeros((new_capacity, self.vector_size), dtype=self._vectors.dtype)
+        grown[: self._size] = self._vectors[: self._size]
+        self._vectors = grown
+        if self._scales is not None:
+            self._scales = np.concatenate([self._scales, np.ones(new_capacity - len(self._scales), dtype=np.float32)])
+        if self._full is not None:
+            self._full.resize(new_capacity)
+
+    def upsert(self, ids: Sequence[str], vectors, payloads: Sequence[dict]) -> int:
+        with self._lock:
+            if not len(ids):
+                return 0
+            normalized = _normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.vector_size))
+
+            rows = np.empty(len(ids), dtype=np.int64)
+            new_count = sum(1 for point_id in dict.fromkeys(ids) if point_id not in self._rows)
+            self._reserve(self._size + new_count)
+            for i, (point_id, payload) in enumerate(zip(ids, payloads)):
+                row = self._rows.get(point_id)
+                if row is None:
+                    row = self._size
+                    self._rows[point_id] = row
+                    self._ids.append(point_id)
+                    self._payloads.append(payload)
+                    self._size += 1
+                else:
+                    self._payloads[row] = payload
+                rows[i] = row
+
+            self._quantize(rows, normalized)
+            self._metadata_columns.clear()
+            self._update_ann(rows, normalized)
+            return len(ids)
+
+    def _update_ann(self, rows: np.ndarray, normalized: np.ndarray) -> None:
+        if self._ann is None:
+            return
+        if self._ann.trained and self._size <= 4 * self._ann.trained_size:
+            self._ann.assign(rows, normalized)
+        elif self._size >= self.ann_min_points:
+            sample = np.arange(self._size)
+            if self._size > 65536:
+                sample = np.sort(np.random.default_rng(0).choice(self._size, size=65536, replace=False))
+            self._ann.train(self._dequantize(sample), self._size)
+            for start in range(0, self._size, _SCAN_BLOCK_ROWS):
+                block = np.arange(start, min(start + _SCAN_BLOCK_ROWS, self._size))
+                self._ann.assign(block, self._dequantize(block))
+
+    def existing_ids(self, ids: Sequence[str]) -> set[str]:
+        with self._lock:
+            return {point_id for point_id in ids if point_id in self._rows}
+
+    def touch(self, ids: Sequence[str], indexed_at: float) -> None:
+        with self._lock:
+            for point_id in ids:
+                row = self._rows.get(point_id)
+                if row is not None:
+                    self._payloads[row]["indexed_at"] = indexed_at
+            self._metadata_columns.clear()
+
+    def delete(self, ids: Sequence[str]) -> int:
+        with self._lock:
+            doomed = {self._rows[point_id] for point_id in ids if point_id in self._rows}
+            if not doomed:
+                return 0
+
+            keep = np.ones(self._size, dtype=bool)
+            keep[list(doomed)] = False
+            kept_rows = np.flatnonzero(keep)
+            self._vectors[: len(kept_rows)] = self._vectors[kept_rows]
+            if self._scales is not None:
+                self._scales[: len(kept_rows)] = self._scales[kept_rows]
+            if self._full is not None:
+                self._full.array[: len(kept_rows)] = self._full.array[kept_rows]
+            if self._ann is not None and self._ann.trained:
+                self._ann.compact(kept_rows)
+            self._ids = [self._ids[i] for i in kept_rows]
+            self._payloads = [self._payloads[i] for i in kept_rows]
+            self._rows = {point_id: row for row, point_id in enumerate(self._ids)}
+            self._size = len(kept_rows)
+            self._metadata_columns.clear()
+            return len(doomed)
+
+    def _column(self, key: str, values) -> np.ndarray:
+        column = self._metadata_columns.get(key)
+        if column is None:
+            column = np.empty(self._size, dtype=object)
+            column[:] = list(values)
+            self._metadata_columns[key] = column
+        return column
+
+    def expired_ids(self, cutoff: float) -> list[str]:
+        with self._lock:
+            indexed_at = self._column("@indexed_at", (p.get("indexed_at", 0.0) for p in self._payloads))
+            return [self._ids[i] for i in np.flatnonzero(indexed_at.astype(np.float64) < cutoff)]
+
+    def filter_mask(self, metadata_filter: Optional[Dict[str, Any]], namespace: Optional[str] = None) -> np.ndarray:
+        mask = np.ones(self._size, dtype=bool)
+        if namespace:
+            mask &= self._column("@namespace", (p.get("namespace") for p in self._payloads)) == namespace
+        for key, value in (metadata_filter or {}).items():
+            mask &= self._column(key, (p.get("metadata", {}).get(key) for p in self._payloads)) == value
+        return mask
+
+    def search_batch(
+        self,
+        query_vectors,
+        top_ks: List[int],
+        metadata_filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+        namespace: Optional[str] = None,
+        exact: bool = False,
+        nprobe: Optional[int] = None,
+        point_ids: Optional[Sequence[str]] = None,
+    ) -> list[list[LocalHit]]:
+        with self._lock:
+            if metadata_filters is None:
+                metadata_filters = [None] * len(top_ks)
+            if not self._size:
+                return [[] for _ in top_ks]
+
+            queries = _normalize_rows(np.asarray(query_vectors, dtype=np.float32).reshape(len(top_ks), self.vector_size))
+            use_ann = not exact and self._ann is not None and self._ann.trained
+            scope = None
+            if point_ids is not None:
+                scope = np.zeros(self._size, dtype=bool)
+                scope[[self._rows[point_id] for point_id in point_ids if point_id in self._rows]] = True
+            exact_scores = None if use_ann else self._score_rows(queries)
+
+            results: list[list[LocalHit]] = []
+            for position, (query, top_k, metadata_filter) in enumerate(zip(queries, top_ks, metadata_filters)):
+                mask = self.filter_mask(metadata_filter, namespace) if (metadata_filter or namespace) else None
+                if scope is not None:
+                    mask = scope if mask is None else mask & scope
+                candidates = None
+                if use_ann:
+                    candidates = self._ann.candidates(query, self._size, nprobe)
+                    if mask is not None:
+                        candidates = candidates[mask[candidates]]
+                    if len(candidates) < top_k:
+                        # Probed buckets hold too few matching rows (e.g. a small namespace); scan exactly.
+                        candidates = None
+                if candidates is not None:
+                    scores = self._score_rows(query[None, :], candidates)[0]
+                else:
+                    candidates = np.flatnonzero(mask) if mask is not None else np.arange(self._size)
+                    if exact_scores is not None:
+                        scores = exact_scores[position][candidates]
+                    else:
+                        scores = self._score_rows(query[None, :], candidates)[0]
+                if self._full is not None and top_k > 0 and len(candidates):
+                    candidates, scores = self._rescore(query, candidates, scores, top_k)
+                results.append(self._top_hits(candidates, scores, top_k))
+            return results
+
+    def _rescore(
+        self, query: np.ndarray, candidates: np.ndarray, scores: np.ndarray, top_k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        shortlist = min(len(candidates), top_k * self.rescore_factor)
+        if shortlist < len(candidates):
+            keep = np.argpartition(-scores, shortlist - 1)[:shortlist]
+            candidates = candidates[keep]
+        order = np.argsort(candidates)
+        candidates = candidates[order]
+        return candidates, np.asarray(self._full.array[candidates] @ query, dtype=np.float32)
+
+    def _top_hits(self, candidates: np.ndarray, scores: np.ndarray, top_k: int) -> list[LocalHit]:
+        if top_k <= 0 or not len(candidates):
+            return []
+        if len(candidates) > top_k:
+            keep = np.argpartition(-scores, top_k - 1)[:top_k]
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")
+        return [
+            LocalHit(id=self._ids[row], score=float(score), payload=self._payloads[row])
+            for row, score in zip(candidates[order], scores[order])
+        ]
+
+    def recall_at_k(self, k: int = 10, sample: int = 100, nprobe: Optional[int] = None) -> float:
+        """
+        Self-check: mean overlap between regular search results and an exact top-k,
+        using stored vectors as queries. The reference uses full-precision vectors
+        when they are kept (rescore mode), so the figure covers quantization error
+        as well as ANN misses.
+        """
+        with self._lock:
+            if not self._size:
+                return 1.0
+            rows = np.random.default_rng(0).choice(self._size, size=min(sample, self._size), replace=False)
+            queries = self._full.array[rows] if self._full is not None else self._dequantize(rows)
+            top_ks = [k] * len(rows)
+            approximate = self.search_batch(queries, top_ks, nprobe=nprobe)
+            if self._full is not None:
+                reference_scores = queries @ self._full.array[: self._size].T
+                exact = [set(np.argsort(-row, kind="stable")[:k].tolist()) for row in reference_scores]
+                found = [{self._rows[hit.id] for hit in hits} for hits in approximate]
+            else:
+                exact = [{hit.id for hit in hits} for hits in self.search_batch(queries, top_ks, exact=True)]
+                found = [{hit.id for hit in hits} for hits in approximate]
+            return float(np.mean([len(f & e) / max(1, len(e)) for f, e in zip(found, exact)]))
+
+    def quantization_recall(self, vectors, k: int = 10, sample: int = 32) -> Optional[float]:
+        """
+        Sampled recall@k of exact search over `vectors` stored in this store's dtype
+        (and rescore mode) against float32 exact search; None for float32 storage.
+        Covers quantization error only, independently of the IVF index.
+        """
+        if self.dtype == "float32":
+            return None
+        normalized = _normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(-1, self.vector_size))
+        if not len(normalized):
+            return None
+        scratch = LocalVectorStore(
+            self.vector_size,
+            initial_capacity=len(normalized),
+            dtype=self.dtype,
+            rescore=self._full is not None,
+            rescore_factor=self.rescore_factor,
+        )
+        ids = [str(row) for row in range(len(normalized))]
+        scratch.upsert(ids, normalized, [{} for _ in ids])
+        rows = np.random.default_rng(0).choice(len(normalized), size=min(sample, len(normalized)), replace=False)
+        queries = normalized[rows]
+        reference = np.argsort(-(queries @ normalized.T), axis=1, kind="stable")[:, :k]
+        found = scratch.search_batch(queries, [k] * len(rows), exact=True)
+        overlaps = [
+            len({int(hit.id) for hit in hits} & set(expected.tolist())) / max(1, len(expected))
+            for hits, expected in zip(found, reference)
+        ]
+        return float(np.mean(overlaps))
+
+    def ann_recall(self, k: int = 10, sample: int = 32) -> Optional[float]:
+        """`recall_at_k` of the IVF index, measured once per training; None until an index is trained."""
+        with self._lock:
+            if self._ann is None or not self._ann.trained:
+                return None
+            if self._ann_recall is None or self._ann_recall[0] != self._ann.trained_size:
+                self._ann_recall = (self._ann.trained_size, self.recall_at_k(k=k, sample=sample))
+            return self._ann_recall[1]
@@ -0,0 +1,535 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.retrieval.ivf import IVFIndex
+from app.retrieval.local_store import _SCAN_BLOCK_ROWS, LocalHit, _normalize_rows
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger("venturelens.mmap_store")
+
+
+_SQL_CHUNK = 500
+
+
+def _chunks(items: Sequence, size: int = _SQL_CHUNK):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class MmapVectorStore:
+    """
+    Persistent local vector store. Normalized float32 vectors are appended to a flat
+    file that readers memory-map read-only, so the corpus opens without loading it
+    and several worker processes share the same pages through the OS page cache.
+    Ids, payloads and tombstones live in a SQLite sidecar; each handle mirrors the
+    tombstones in an in-memory bitmap, reloaded only when another handle changes them.
+
+    Appends are crash-safe: vectors are written and fsynced past the committed row
+    count, and the count only advances in the same SQLite transaction that records
+    their payloads. A torn append leaves an ignored tail that the next append
+    overwrites. Overwrites and deletes tombstone the old row; once more than
+    `compact_ratio` of the rows (and at least `compact_min_rows`) are tombstoned, the
+    live rows are copied to a new file that replaces the old one in the same commit
+    that renumbers them.
+
+    With `ann_min_points > 0` an in-memory IVF index over the mapped rows is trained
+    once that many points are live, as in `LocalVectorStore`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        vector_size: int = 0,
+        ann_min_points: int = 0,
+        ann_nprobe: int = 8,
+        ann_lists: int = 0,
+        compact_ratio: float = 0.5,
+        compact_min_rows: int = 1024,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ann_min_points = ann_min_points
+        self.compact_ratio = compact_ratio
+        self.compact_min_rows = compact_min_rows
+        self._ann_options = (ann_lists, ann_nprobe)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            os.path.join(directory, "points.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=30,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS points (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                namespace TEXT,
+                indexed_at REAL NOT NULL DEFAULT 0,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                payload TEXT NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS points_live_id ON points(id) WHERE deleted = 0;
+            CREATE INDEX IF NOT EXISTS points_namespace ON points(namespace) WHERE deleted = 0;
+            CREATE INDEX IF NOT EXISTS points_indexed_at ON points(indexed_at) WHERE deleted = 0;
+            CREATE INDEX IF NOT EXISTS points_deleted ON points(deleted) WHERE deleted = 1;
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('rows', 0);
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+            INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', 0);
+            """
+        )
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('vector_size', ?)", (vector_size,))
+        stored_size = self._meta("vector_size")
+        if not stored_size and vector_size:
+            self._conn.execute("UPDATE meta SET value = ? WHERE key = 'vector_size'", (vector_size,))
+            stored_size = vector_size
+        if vector_size and stored_size != vector_size:
+            self._conn.close()
+            raise ValueError(f"Vector store at {directory} holds {stored_size}-d vectors, not {vector_size}-d")
+
+        self.vector_size = stored_size
+        self._epoch = 0
+        self._generation = -1
+        self._mapped_rows = 0
+        self._matrix = np.zeros((0, self.vector_size), dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._ann = self._new_ann()
+        self._ann_recall: Optional[tuple[int, float]] = None
+
+    def _new_ann(self) -> Optional[IVFIndex]:
+        n_lists, nprobe = self._ann_options
+        return IVFIndex(n_lists=n_lists, nprobe=nprobe) if self.ann_min_points > 0 else None
+
+    def _meta(self, key: str) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def _path(self, epoch: int) -> str:
+        return os.path.join(self.directory, "vectors.f32" if not epoch else f"vectors.{epoch}.f32")
+
+    def _sync(self) -> np.ndarray:
+        """Catches up with commits from any handle: new rows, tombstones and compactions."""
+        state = dict(self._conn.execute("SELECT key, value FROM meta WHERE key IN ('rows', 'generation', 'epoch')"))
+        rows, generation, epoch = state["rows"], state["generation"], state["epoch"]
+        if epoch != self._epoch:
+            self._epoch, self._generation, self._mapped_rows = epoch, -1, 0
+            self._alive = np.zeros(0, dtype=bool)
+            self._ann = self._new_ann()
+
+        if rows != self._mapped_rows:
+            previous = self._mapped_rows
+            if rows:
+                try:
+                    self._matrix = np.memmap(self._path(epoch), dtype=np.float32, mode="r", shape=(rows, self.vector_size))
+                except FileNotFoundError:
+                    # Another handle compacted (and unlinked this epoch's file) after the meta read above.
+                    return self._sync()
+            else:
+                self._matrix = np.zeros((0, self.vector_size), dtype=np.float32)
+            alive = np.ones(rows, dtype=bool)
+            alive[:previous] = self._alive[:previous]
+            self._alive = alive
+            self._mapped_rows = rows
+            if rows > previous:
+                self._update_ann(np.arange(previous, rows))
+
+        if generation != self._generation:
+            self._alive[:] = True
+            dead = np.fromiter((row for (row,) in self._conn.execute("SELECT row FROM points WHERE deleted = 1")), dtype=np.int64)
+            self._alive[dead[dead < rows]] = False
+            self._generation = generation
+        return self._matrix
+
+    def _update_ann(self, rows: np.ndarray) -> None:
+        if self._ann is None:
+            return
+        if self._ann.trained and self._mapped_rows <= 4 * self._ann.trained_size:
+            self._ann.assign(rows, self._matrix[rows])
+            return
+        live = np.flatnonzero(self._alive)
+        if len(live) < self.ann_min_points:
+            return
+        sample = live
+        if len(live) > 65536:
+            sample = np.sort(np.random.default_rng(0).choice(live, size=65536, replace=False))
+        self._ann.train(self._matrix[sample], len(live))
+        for start in range(0, self._mapped_rows, _SCAN_BLOCK_ROWS):
+            block = np.arange(start, min(start + _SCAN_BLOCK_ROWS, self._mapped_rows))
+            self._ann.assign(block, self._matrix[block])
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM points WHERE deleted = 0").fetchone()[0]
+
+    def _tombstone(self, ids: Sequence[str]) -> list[int]:
+        rows: list[int] = []
+        for chunk in _chunks(list(ids)):
+            placeholders = ",".join("?" * len(chunk))
+            rows.extend(
+                row for (row,) in self._conn.execute(f"SELECT row FROM points WHERE deleted = 0 AND id IN ({placeholders})", chunk)
+            )
+        for chunk in _chunks(rows):
+            placeholders = ",".join("?" * len(chunk))
+            self._conn.execute(f"UPDATE points SET deleted = 1 WHERE row IN ({placeholders})", chunk)
+        return rows
+
+    def _commit_write(self, rows: list[int], new_rows: int) -> None:
+        generation = self._generation + 1
+        self._conn.executemany(
+            "UPDATE meta SET value = ? WHERE key = ?", [(new_rows, "rows"), (generation, "generation")]
+        )
+        self._conn.execute("COMMIT")
+        self._alive[rows] = False
+        self._generation = generation
+
+    def upsert(self, ids: Sequence[str], vectors, payloads: Sequence[dict]) -> int:
+        if not len(ids):
+            return 0
+        normalized = _normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.vector_size))
+        # Last occurrence wins when a batch repeats an id.
+        latest = {point_id: i for i, point_id in enumerate(ids)}
+        positions = sorted(latest.values())
+        block = np.ascontiguousarray(normalized[positions])
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                start = self._mapped_rows
+                path = self._path(self._epoch)
+                with open(path, "r+b" if os.path.exists(path) else "w+b") as handle:
+                    handle.seek(start * self.vector_size * 4)
+                    handle.write(block.tobytes())
+                    handle.flush()
+                    os.fsync(handle.fileno())
+
+                replaced = self._tombstone(list(latest))
+                self._conn.executemany(
+                    "INSERT INTO points (row, id, namespace, indexed_at, payload) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            start + offset,
+                            ids[i],
+                            payloads[i].get("namespace"),
+                            float(payloads[i].get("indexed_at", 0.0)),
+                            json.dumps(payloads[i]),
+                        )
+                        for offset, i in enumerate(positions)
+                    ],
+                )
+                self._commit_write(replaced, start + len(positions))
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._sync()
+            self._maybe_compact()
+        return len(ids)
+
+    def existing_ids(self, ids: Sequence[str]) -> set[str]:
+        found: set[str] = set()
+        with self._lock:
+            for chunk in _chunks(list(ids)):
+                placeholders = ",".join("?" * len(chunk))
+                found.update(
+                    point_id
+                    for (point_id,) in self._conn.execute(
+                        f"SELECT id FROM points WHERE deleted = 0 AND id IN ({placeholders})", chunk
+                    )
+                )
+        return found
+
+    def touch(self, ids: Sequence[str], indexed_at: float) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for chunk in _chunks(list(ids)):
+                    placeholders = ",".join("?" * len(chunk))
+                    self._conn.execute(
+                        f"UPDATE points SET indexed_at = ?, payload = json_set(payload, '$.indexed_at', ?) "
+                        f"WHERE deleted = 0 AND id IN ({placeholders})",
+                        (indexed_at, indexed_at, *chunk),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, ids: Sequence[str]) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._sync()
+                rows = self._tombstone(ids)
+                if not rows:
+                    self._conn.execute("ROLLBACK")
+                    return 0
+                self._commit_write(rows, self._mapped_rows)
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._maybe_compact()
+        return len(rows)
+
+    def _maybe_compact(self) -> None:
+        dead = self._mapped_rows - int(self._alive.sum())
+        if dead and dead >= self.compact_min_rows and dead > self.compact_ratio * self._mapped_rows:
+            self._compact()
+
+    def compact(self) -> int:
+        """Rewrites the vector file without tombstoned rows; returns how many rows were dropped."""
+        with self._lock:
+            return self._compact()
+
+    def _compact(self) -> int:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            matrix = self._sync()
+            kept_rows = np.flatnonzero(self._alive)
+            if len(kept_rows) == len(matrix):
+                self._conn.execute("ROLLBACK")
+                return 0
+
+            epoch = self._epoch + 1
+            with open(self._path(epoch), "wb") as handle:
+                for start in range(0, len(kept_rows), _SCAN_BLOCK_ROWS):
+                    handle.write(np.ascontiguousarray(matrix[kept_rows[start : start + _SCAN_BLOCK_ROWS]]).tobytes())
+                handle.flush()
+                os.fsync(handle.fileno())
+
+            self._conn.execute("DELETE FROM points WHERE deleted = 1")
+            # Ascending order: every target row is already vacated when a row moves down into it.
+            self._conn.executemany(
+                "UPDATE points SET row = ? WHERE row = ?",
+                ((new, int(old)) for new, old in enumerate(kept_rows) if new != old),
+            )
+            generation = self._generation + 1
+            self._conn.executemany(
+                "UPDATE meta SET value = ? WHERE key = ?",
+                [(len(kept_rows), "rows"), (generation, "generation"), (epoch, "epoch")],
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            raise
+
+        dropped = len(matrix) - len(kept_rows)
+        self._epoch, self._generation, self._mapped_rows = epoch, generation, len(kept_rows)
+        self._alive = np.ones(len(kept_rows), dtype=bool)
+        self._matrix = (
+            np.memmap(self._path(epoch), dtype=np.float32, mode="r", shape=(len(kept_rows), self.vector_size))
+            if len(kept_rows)
+            else np.zeros((0, self.vector_size), dtype=np.float32)
+        )
+        if self._ann is not None and self._ann.trained:
+            self._ann.compact(kept_rows)
+        # Other handles still mapping an old file keep their pages until they re-sync; a handle
+        # that has not mapped it yet re-reads the epoch in `_sync`. Files that cannot be removed
+        # yet (mapped on platforms that forbid it) are retried at the next compaction.
+        current = os.path.basename(self._path(epoch))
+        for name in os.listdir(self.directory):
+            if name.startswith("vectors") and name.endswith(".f32") and name != current:
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.directory, name))
+        return dropped
+
+    def expired_ids(self, cutoff: float) -> list[str]:
+        with self._lock:
+            return [
+                point_id
+                for (point_id,) in self._conn.execute(
+                    "SELECT id FROM points WHERE deleted = 0 AND indexed_at < ?", (cutoff,)
+                )
+            ]
+
+    def _filtered_rows(self, metadata_filter: Optional[Dict[str, Any]], namespace: Optional[str]) -> np.ndarray:
+        conditions = ["deleted = 0"]
+        params: list = []
+        if namespace:
+            conditions.append("namespace = ?")
+            params.append(namespace)
+        for key, value in (metadata_filter or {}).items():
+            conditions.append("json_extract(payload, ?) = ?")
+            params.extend([f'$.metadata."{key}"', value])
+        sql = f"SELECT row FROM points WHERE {' AND '.join(conditions)}"
+        return np.fromiter((row for (row,) in self._conn.execute(sql, params)), dtype=np.int64)
+
+    def search_batch(
+        self,
+        query_vectors,
+        top_ks: List[int],
+        metadata_filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+        namespace: Optional[str] = None,
+        exact: bool = False,
+        nprobe: Optional[int] = None,
+        point_ids: Optional[Sequence[str]] = None,
+    ) -> list[list[LocalHit]]:
+        if metadata_filters is None:
+            metadata_filters = [None] * len(top_ks)
+
+        with self._lock:
+            matrix = self._sync()
+            if not len(matrix):
+                return [[] for _ in top_ks]
+            queries = _normalize_rows(np.asarray(query_vectors, dtype=np.float32).reshape(len(top_ks), self.vector_size))
+            use_ann = not exact and self._ann is not None and self._ann.trained
+
+            scope = None
+            if point_ids is not None:
+                scope = np.zeros(len(matrix), dtype=bool)
+                for chunk in _chunks(list(point_ids)):
+                    placeholders = ",".join("?" * len(chunk))
+                    cursor = self._conn.execute(
+                        f"SELECT row FROM points WHERE deleted = 0 AND id IN ({placeholders})", chunk
+                    )
+                    rows = np.array([row for (row,) in cursor], dtype=np.int64)
+                    scope[rows[rows < len(matrix)]] = True
+
+            unfiltered = []
+            if scope is None:
+                unfiltered = [i for i, f in enumerate(metadata_filters) if not f and not namespace]
+            full_scores = queries[unfiltered] @ matrix.T if unfiltered and not use_ann else None
+
+            selections: list[tuple[np.ndarray, np.ndarray]] = []
+            for position, (query, top_k, metadata_filter) in enumerate(zip(queries, top_ks, metadata_filters)):
+                allowed = self._alive if scope is None else scope
+                if metadata_filter or namespace:
+                    filtered = np.zeros(len(matrix), dtype=bool)
+                    rows = self._filtered_rows(metadata_filter, namespace)
+                    filtered[rows[rows < len(matrix)]] = True
+                    allowed = allowed & filtered
+                candidates = None
+                if use_ann:
+                    candidates = self._ann.candidates(query, len(matrix), nprobe)
+                    candidates = np.sort(candidates[allowed[candidates]])
+                    if len(candidates) < top_k:
+                        # Probed buckets hold too few matching rows (e.g. a small namespace); scan exactly.
+                        candidates = None
+                if candidates is None:
+                    candidates = np.flatnonzero(allowed)
+                    if full_scores is not None and position in unfiltered:
+                        scores = full_scores[unfiltered.index(position)][candidates]
+                    else:
+                        scores = matrix[candidates] @ query
+                else:
+                    scores = matrix[candidates] @ query
+                if top_k <= 0 or not len(candidates):
+                    selections.append((candidates[:0], scores[:0]))
+                    continue
+                if len(candidates) > top_k:
+                    keep = np.argpartition(-scores, top_k - 1)[:top_k]
+                    candidates, scores = candidates[keep], scores[keep]
+                order = np.argsort(-scores, kind="stable")
+                selections.append((candidates[order], scores[order]))
+
+            wanted = sorted({int(row) for rows, _ in selections for row in rows})
+            records: dict[int, tuple[str, dict]] = {}
+            for chunk in _chunks(wanted):
+                placeholders = ",".join("?" * len(chunk))
+                for row, point_id, payload in self._conn.execute(
+                    f"SELECT row, id, payload FROM points WHERE row IN ({placeholders})", chunk
+                ):
+                    records[row] = (point_id, json.loads(payload))
+
+        return [
+            [
+                LocalHit(id=records[int(row)][0], score=float(score), payload=records[int(row)][1])
+                for row, score in zip(rows, scores)
+            ]
+            for rows, scores in selections
+        ]
+
+    def recall_at_k(self, k: int = 10, sample: int = 100, nprobe: Optional[int] = None) -> float:
+        """Mean overlap between regular and exact top-k search, using stored live vectors as queries."""
+        with self._lock:
+            matrix = self._sync()
+            live = np.flatnonzero(self._alive)
+            if not len(live):
+                return 1.0
+            rows = np.sort(np.random.default_rng(0).choice(live, size=min(sample, len(live)), replace=False))
+            queries = np.array(matrix[rows])
+        top_ks = [k] * len(rows)
+        approximate = self.search_batch(queries, top_ks, nprobe=nprobe)
+        exact = self.search_batch(queries, top_ks, exact=True)
+        overlaps = [len({h.id for h in a} & {h.id for h in e}) / max(1, len(e)) for a, e in zip(approximate, exact)]
+        return float(np.mean(overlaps))
+
+    def quantization_recall(self, vectors, k: int = 10, sample: int = 32) -> Optional[float]:
+        """Always None: vectors are stored as float32."""
+        return None
+
+    def ann_recall(self, k: int = 10, sample: int = 32) -> Optional[float]:
+        """`recall_at_k` of the IVF index, measured once per training; None until an index is trained."""
+        with self._lock:
+            self._sync()
+            if self._ann is None or not self._ann.trained:
+                return None
+            trained_size = self._ann.trained_size
+            if self._ann_recall is not None and self._ann_recall[0] == trained_size:
+                return self._ann_recall[1]
+        recall = self.recall_at_k(k=k, sample=sample)
+        with self._lock:
+            self._ann_recall = (trained_size, recall)
+        return recall
+
+    def memory_stats(self) -> dict:
+        with self._lock:
+            self._sync()
+            rows = self._mapped_rows
+            points = int(self._alive.sum())
+            ann_trained = self._ann is not None and self._ann.trained
+        return {
+            "dtype": "float32",
+            "points": points,
+            "vector_bytes_per_point": 4 * self.vector_size,
+            "float32_bytes_per_point": 4 * self.vector_size,
+            "mapped_bytes": rows * self.vector_size * 4,
+            "tombstoned_rows": rows - points,
+            "ann_trained": ann_trained,
+            "persistent": True,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_stores: dict[str, MmapVectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def open_mmap_store(directory: str, vector_size: int = 0, dtype: str = "float32", **options) -> Optional[MmapVectorStore]:
+    """
+    Process-wide handle per directory; `options` (ANN and compaction settings) apply when
+    it is first opened. Returns None when the directory holds vectors of a different
+    size, or when nothing exists yet and no size was given.
+    """
+    directory = os.path.abspath(os.path.expanduser(directory))
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            if not vector_size and not os.path.exists(os.path.join(directory, "points.sqlite3")):
+                return None
+            try:
+                store = MmapVectorStore(directory, vector_size, **options)
+            except ValueError:
+                return None
+            if dtype != "float32":
+                logger.warning("mmap_store_dtype_ignored dtype=%s path=%s (vectors are stored as float32)", dtype, directory)
+            _stores[directory] = store
+        if vector_size and store.vector_size != vector_size:
+            return None
+        return store
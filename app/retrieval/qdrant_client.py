@@ -1,23 +1,44 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional
 from uuid import uuid4
 
 import numpy as np
 
+from app.config.settings import get_settings
 from app.models.schemas import SourceDocument
+from app.retrieval.chunk_store import ChunkStore
+from app.retrieval.local_store import LocalHit, LocalVectorStore
+from app.retrieval.mmap_store import open_mmap_store
+from app.utils.logger import setup_logger
 
 
-@dataclass
-class LocalHit:
-    score: float
-    payload: dict
+settings = get_settings()
+logger = setup_logger("venturelens.qdrant")
+
+# In-process backends handed out by `open_vector_store`, so every request (and the
+# TTL sweeper) sees the same points instead of a fresh, empty store.
+_shared_clients: dict[str, Any] = {}
+_shared_local_stores: dict[str, LocalVectorStore] = {}
+_shared_lock = threading.Lock()
 
 
 class VentureQdrant:
     """
-    Uses qdrant-client when installed, otherwise falls back to an in-memory vector store.
+    Uses qdrant-client when installed, otherwise falls back to a local vector store:
+    memory-mapped and persistent under `LOCAL_VECTOR_STORE_PATH` when set, in-memory otherwise.
+
+    Points carry a `namespace` (one per startup) and an `indexed_at` timestamp. A store
+    opened with a namespace only searches that namespace; `delete_expired` removes
+    points that have not been re-indexed within a TTL.
+
+    With `shared=True` the embedded Qdrant client and the in-memory fallback are
+    process-wide per location/collection; `persistent=False` ignores
+    `LOCAL_VECTOR_STORE_PATH`.
     """
 
     def __init__(
@@ -27,11 +48,19 @@ class VentureQdrant:
         qdrant_url: str = "",
         qdrant_api_key: str = "",
         local_path: str = ":memory:",
+        namespace: str = "",
+        shared: bool = False,
+        persistent: bool = True,
     ) -> None:
         self.collection_name = collection_name
         self.vector_size = vector_size
+        self.namespace = namespace
+        self.shared = shared
+        self.persistent = persistent
         self._backend = "local"
-        self._local_points: list[dict] = []
+        self._local_store = None
+        # Last point of an unacknowledged (wait=False) upsert; re-sent with wait=True by `flush`.
+        self._barrier_point = None
 
         try:
             from qdrant_client import QdrantClient
@@ -40,6 +69,11 @@ class VentureQdrant:
             self._models = models
             if qdrant_url:
                 self.client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
+            elif shared:
+                with _shared_lock:
+                    if local_path not in _shared_clients:
+                        _shared_clients[local_path] = QdrantClient(location=local_path)
+                    self.client = _shared_clients[local_path]
             else:
                 self.client = QdrantClient(location=local_path)
             self._ensure_collection(vector_size)
@@ -47,6 +81,50 @@ class VentureQdrant:
         except Exception:
             self.client = None
             self._models = None
+            self._local_store = self._open_local_store(vector_size)
+
+    def _open_local_store(self, vector_size: int):
+        if self.persistent and settings.local_vector_store_path:
+            directory = os.path.join(settings.local_vector_store_path, self.collection_name)
+            store = open_mmap_store(
+                directory,
+                vector_size,
+                dtype=settings.local_vector_dtype,
+                ann_min_points=settings.local_ann_min_points,
+                ann_nprobe=settings.local_ann_nprobe,
+                ann_lists=settings.local_ann_lists,
+            )
+            if store is not None:
+                return store
+            if vector_size:
+                logger.warning("local_store_fallback reason=vector_size_mismatch path=%s size=%s", directory, vector_size)
+
+        if not self.shared:
+            return self._new_local_store(vector_size)
+        with _shared_lock:
+            store = _shared_local_stores.get(self.collection_name)
+            if store is None or (vector_size and store.vector_size != vector_size):
+                if not vector_size:
+                    return self._new_local_store(0)
+                if store is not None:
+                    logger.warning(
+                        "local_store_replaced reason=vector_size_mismatch collection=%s size=%s",
+                        self.collection_name,
+                        vector_size,
+                    )
+                store = _shared_local_stores[self.collection_name] = self._new_local_store(vector_size)
+            return store
+
+    @staticmethod
+    def _new_local_store(vector_size: int) -> LocalVectorStore:
+        return LocalVectorStore(
+            vector_size,
+            ann_min_points=settings.local_ann_min_points,
+            ann_nprobe=settings.local_ann_nprobe,
+            ann_lists=settings.local_ann_lists,
+            dtype=settings.local_vector_dtype,
+            rescore=settings.local_vector_rescore,
+        )
 
     def _ensure_collection(self, vector_size: int) -> None:
         if self.client is None:
@@ -54,79 +132,239 @@ class VentureQdrant:
 
         collections = self.client.get_collections().collections
         existing = {c.name for c in collections}
-        if self.collection_name not in existing:
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=self._models.VectorParams(size=vector_size, distance=self._models.Distance.COSINE),
-            )
+        if self.collection_name in existing or not vector_size:
+            return
+
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=self._models.VectorParams(size=vector_size, distance=self._models.Distance.COSINE),
+        )
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name="namespace",
+            field_schema=self._models.PayloadSchemaType.KEYWORD,
+        )
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name="indexed_at",
+            field_schema=self._models.PayloadSchemaType.FLOAT,
+        )
+
+    def upsert_documents(
+        self,
+        docs: List[SourceDocument],
+        vectors,
+        ids: Optional[List[str]] = None,
+        wait: bool = True,
+    ) -> int:
+        """
+        Upserts in batches of `QDRANT_UPSERT_BATCH_SIZE`, sent over up to
+        `QDRANT_UPSERT_PARALLELISM` concurrent requests. With `wait=False` Qdrant
+        acknowledges before indexing; call `flush` before searching.
+        """
+        if ids is None:
+            ids = [doc.id or str(uuid4()) for doc in docs]
+        payloads = [{"source": doc.source, "type": doc.type, "content": doc.content, "metadata": doc.metadata} for doc in docs]
+        return self._upsert(ids, vectors, payloads, wait)
+
+    def upsert_chunks(self, chunks: ChunkStore, vectors, wait: bool = True) -> int:
+        """Same as `upsert_documents`, building each payload straight from the chunk store."""
+        return self._upsert(chunks.ids, vectors, [chunks.payload(i) for i in range(len(chunks))], wait)
+
+    def _upsert(self, ids: List[str], vectors, payloads: List[dict], wait: bool) -> int:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        indexed_at = time.time()
+        for payload in payloads:
+            payload["namespace"] = self.namespace
+            payload["indexed_at"] = indexed_at
+
+        if self._backend == "qdrant" and self.client is not None:
+            if not ids:
+                return 0
+            batch_size = max(1, settings.qdrant_upsert_batch_size)
+            batches = [slice(start, start + batch_size) for start in range(0, len(ids), batch_size)]
+
+            def send(batch: slice) -> None:
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=self._models.Batch(ids=ids[batch], vectors=vectors[batch].tolist(), payloads=payloads[batch]),
+                    wait=wait,
+                )
+
+            workers = min(len(batches), max(1, settings.qdrant_upsert_parallelism))
+            if workers == 1:
+                for batch in batches:
+                    send(batch)
+            else:
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qdrant-upsert") as pool:
+                    list(pool.map(send, batches))
+            if not wait:
+                self._barrier_point = (ids[-1], vectors[-1].tolist(), payloads[-1])
+            return len(ids)
+
+        return self._local_store.upsert(ids, vectors, payloads)
+
+    def flush(self) -> None:
+        """
+        Consistency barrier after `wait=False` upserts. Qdrant applies operations in
+        order, so re-upserting one already-acknowledged point with wait=True returns
+        only once everything sent before it is applied.
+        """
+        if self._barrier_point is None or self.client is None:
+            return
+        point_id, vector, payload = self._barrier_point
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[self._models.PointStruct(id=point_id, vector=vector, payload=payload)],
+            wait=True,
+        )
+        self._barrier_point = None
+
+    def memory_stats(self) -> dict:
+        """Per-point memory of the local fallback; empty when Qdrant holds the vectors."""
+        if self._backend == "qdrant":
+            return {}
+        return self._local_store.memory_stats()
+
+    def ann_recall(self) -> Optional[float]:
+        """Sampled recall@10 of the local fallback's IVF index; None for Qdrant or while searches are exact."""
+        if self._backend == "qdrant":
+            return None
+        return self._local_store.ann_recall()
+
+    def quantization_recall(self, vectors) -> Optional[float]:
+        """Sampled recall@10 of the local fallback's quantized vectors against float32; None for Qdrant or float32."""
+        if self._backend == "qdrant":
+            return None
+        return self._local_store.quantization_recall(vectors)
+
+    def existing_ids(self, ids: List[str]) -> set[str]:
+        """Returns the subset of `ids` already stored in the collection."""
+        if not ids:
+            return set()
+
+        if self._backend == "qdrant" and self.client is not None:
+            found: set[str] = set()
+            for start in range(0, len(ids), 256):
+                records = self.client.retrieve(
+                    collection_name=self.collection_name,
+                    ids=ids[start : start + 256],
+                    with_payload=False,
+                    with_vectors=False,
+                )
+                found.update(str(record.id) for record in records)
+            return found
+
+        return self._local_store.existing_ids(ids)
+
+    def touch(self, ids: List[str]) -> None:
+        """Refreshes `indexed_at` on reused points so the TTL sweep keeps them."""
+        if not ids:
+            return
 
-    def upsert_documents(self, docs: List[SourceDocument], vectors: List[List[float]]) -> int:
         if self._backend == "qdrant" and self.client is not None:
-            points: list = []
-            for doc, vec in zip(docs, vectors):
-                payload = {
-                    "source": doc.source,
-                    "type": doc.type,
-                    "content": doc.content,
-                    "metadata": doc.metadata,
-                }
-                points.append(self._models.PointStruct(id=str(uuid4()), vector=vec, payload=payload))
-
-            self.client.upsert(collection_name=self.collection_name, points=points)
-            return len(points)
-
-        for doc, vec in zip(docs, vectors):
-            self._local_points.append(
-                {
-                    "id": str(uuid4()),
-                    "vector": np.array(vec, dtype=np.float32),
-                    "payload": {
-                        "source": doc.source,
-                        "type": doc.type,
-                        "content": doc.content,
-                        "metadata": doc.metadata,
-                    },
-                }
+            self.client.set_payload(collection_name=self.collection_name, payload={"indexed_at": time.time()}, points=ids)
+            return
+
+        self._local_store.touch(ids, time.time())
+
+    def delete_expired(self, max_age_seconds: float) -> list[str]:
+        """Deletes points (across all namespaces) not re-indexed within `max_age_seconds`; returns their ids."""
+        cutoff = time.time() - max_age_seconds
+
+        if self._backend == "qdrant" and self.client is not None:
+            if self.collection_name not in {c.name for c in self.client.get_collections().collections}:
+                return []
+            expired = self._models.Filter(
+                must=[self._models.FieldCondition(key="indexed_at", range=self._models.Range(lt=cutoff))]
             )
-        return len(vectors)
+            ids: list[str] = []
+            offset = None
+            while True:
+                records, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=expired,
+                    limit=1024,
+                    offset=offset,
+                    with_payload=False,
+                    with_vectors=False,
+                )
+                ids.extend(str(record.id) for record in records)
+                if offset is None:
+                    break
+            if ids:
+                self.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=self._models.PointIdsList(points=ids),
+                )
+            return ids
+
+        ids = self._local_store.expired_ids(cutoff)
+        self._local_store.delete(ids)
+        return ids
+
+    def _build_filter(self, metadata_filter: Optional[Dict[str, Any]], point_ids: Optional[List[str]] = None):
+        conditions = []
+        if point_ids is not None:
+            conditions.append(self._models.HasIdCondition(has_id=list(point_ids)))
+        if self.namespace:
+            conditions.append(self._models.FieldCondition(key="namespace", match=self._models.MatchValue(value=self.namespace)))
+        for key, value in (metadata_filter or {}).items():
+            conditions.append(self._models.FieldCondition(key=f"metadata.{key}", match=self._models.MatchValue(value=value)))
+        return self._models.Filter(must=conditions) if conditions else None
 
     def search(self, query_vector: List[float], top_k: int = 8, metadata_filter: Optional[Dict[str, Any]] = None):
+        return self.search_batch([query_vector], top_ks=[top_k], metadata_filters=[metadata_filter])[0]
+
+    def search_batch(
+        self,
+        query_vectors: List[List[float]],
+        top_ks: List[int],
+        metadata_filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+        point_ids: Optional[List[str]] = None,
+    ) -> list:
+        """`point_ids` restricts every query to those points (e.g. the chunks of the current run)."""
+        if not len(query_vectors):
+            return []
+        if metadata_filters is None:
+            metadata_filters = [None] * len(query_vectors)
+
         if self._backend == "qdrant" and self.client is not None:
-            query_filter = None
-            if metadata_filter:
-                conditions = []
-                for key, value in metadata_filter.items():
-                    conditions.append(self._models.FieldCondition(key=f"metadata.{key}", match=self._models.MatchValue(value=value)))
-                query_filter = self._models.Filter(must=conditions)
-
-            return self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_vector,
-                query_filter=query_filter,
-                limit=top_k,
-                with_payload=True,
-            )
+            requests = [
+                self._models.SearchRequest(
+                    vector=np.asarray(vector, dtype=np.float32).tolist(),
+                    filter=self._build_filter(metadata_filter, point_ids),
+                    limit=top_k,
+                    with_payload=True,
+                )
+                for vector, top_k, metadata_filter in zip(query_vectors, top_ks, metadata_filters)
+            ]
+            return self.client.search_batch(collection_name=self.collection_name, requests=requests)
+
+        return self._local_store.search_batch(
+            query_vectors, top_ks, metadata_filters, namespace=self.namespace, point_ids=point_ids
+        )
+
 
-        q = np.array(query_vector, dtype=np.float32)
-        q_norm = float(np.linalg.norm(q)) or 1.0
-        hits: list[LocalHit] = []
-
-        for point in self._local_points:
-            payload = point["payload"]
-            if metadata_filter:
-                match = True
-                metadata = payload.get("metadata", {})
-                for key, value in metadata_filter.items():
-                    if metadata.get(key) != value:
-                        match = False
-                        break
-                if not match:
-                    continue
-
-            v = point["vector"]
-            v_norm = float(np.linalg.norm(v)) or 1.0
-            score = float(np.dot(q, v) / (q_norm * v_norm))
-            hits.append(LocalHit(score=score, payload=payload))
-
-        hits.sort(key=lambda x: x.score, reverse=True)
-        return hits[:top_k]
+def open_vector_store(vector_size: int = 0, namespace: str = "", ephemeral: bool = False) -> VentureQdrant:
+    """
+    Opens the configured collection, shared across the process; `vector_size=0` skips
+    creating it when missing. `ephemeral=True` opens a private in-memory store instead,
+    for vectors that only make sense within one run.
+    """
+    if ephemeral:
+        return VentureQdrant(
+            collection_name=settings.qdrant_collection,
+            vector_size=vector_size,
+            namespace=namespace,
+            persistent=False,
+        )
+    return VentureQdrant(
+        collection_name=settings.qdrant_collection,
+        vector_size=vector_size,
+        qdrant_url=settings.qdrant_url,
+        qdrant_api_key=settings.qdrant_api_key,
+        local_path=settings.qdrant_local_path,
+        namespace=namespace,
+        shared=True,
+    )
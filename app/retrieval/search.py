@@ -1,6 +1,9 @@
 from dataclasses import dataclass
+from typing import Optional
 
-from rank_bm25 import BM25Okapi
+import numpy as np
+
+from app.retrieval.chunk_store import ChunkStore
 
 
 @dataclass
@@ -11,86 +14,224 @@ class HybridHit:
     metadata: dict
 
 
+@dataclass
+class RetrievalSpec:
+    query: str
+    metadata_filter: Optional[dict] = None
+    top_k: int = 8
+
+
+def tokenize(text: str) -> list[str]:
+    return text.lower().split()
+
+
+class KeywordIndex:
+    """
+    BM25 (Okapi, same parameters and idf floor as rank_bm25.BM25Okapi) over a fixed corpus.
+    Postings are stored as flat NumPy arrays grouped by term, so scoring a term is a
+    gather plus a scatter-add over its postings instead of a Python loop over documents.
+    """
+
+    def __init__(self, texts: list[str], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25) -> None:
+        self.k1 = k1
+        self.b = b
+        self.corpus_size = len(texts)
+        self.vocabulary: dict[str, int] = {}
+
+        term_ids: list[int] = []
+        doc_ids: list[int] = []
+        doc_len = np.zeros(self.corpus_size, dtype=np.float64)
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_len[doc_id] = len(tokens)
+            for token in tokens:
+                term_ids.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+            doc_ids.extend([doc_id] * len(tokens))
+
+        # Collapse (term, doc) token pairs into postings with term frequencies, grouped by term.
+        pairs = np.array(term_ids, dtype=np.int64) * max(1, self.corpus_size) + np.array(doc_ids, dtype=np.int64)
+        unique_pairs, tf = np.unique(pairs, return_counts=True)
+        posting_terms = unique_pairs // max(1, self.corpus_size)
+        self._posting_docs = (unique_pairs % max(1, self.corpus_size)).astype(np.int64)
+        self._offsets = np.searchsorted(posting_terms, np.arange(len(self.vocabulary) + 1))
+
+        avgdl = float(doc_len.mean()) if self.corpus_size and doc_len.sum() else 1.0
+        self._length_norm = k1 * (1 - b + b * doc_len / avgdl)
+
+        df = np.diff(self._offsets).astype(np.float64)
+        idf = np.log(self.corpus_size - df + 0.5) - np.log(df + 0.5)
+        if len(idf):
+            idf[idf < 0] = epsilon * idf.mean()
+        self._idf = idf
+
+        # Per-posting BM25 contribution; query-independent, so computed once.
+        tf = tf.astype(np.float64)
+        self._posting_scores = (
+            idf[posting_terms] * (tf * (k1 + 1)) / (tf + self._length_norm[self._posting_docs])
+            if len(tf)
+            else np.zeros(0)
+        )
+
+    def scores(self, query: str) -> np.ndarray:
+        return self.scores_batch([query])[0]
+
+    def scores_batch(self, queries: list[str]) -> np.ndarray:
+        result = np.zeros((len(queries), self.corpus_size), dtype=np.float64)
+        for row, query in enumerate(queries):
+            for token in tokenize(query):
+                term_id = self.vocabulary.get(token)
+                if term_id is None:
+                    continue
+                start, end = self._offsets[term_id], self._offsets[term_id + 1]
+                # Postings of one term never repeat a document, so plain fancy-index addition is safe.
+                result[row, self._posting_docs[start:end]] += self._posting_scores[start:end]
+        return result
+
+
 class HybridRetriever:
-    def __init__(self, docs: list[dict]) -> None:
-        self.docs = docs
-        tokenized = [d["content"].lower().split() for d in docs]
-        self.bm25 = BM25Okapi(tokenized) if tokenized else None
+    """
+    Keyword index and per-chunk lookups for one corpus, built once at indexing time
+    and shared by every query against that corpus.
+    """
+
+    def __init__(self, docs: ChunkStore | list[dict], keyword_index=None) -> None:
+        # keyword_index: anything with KeywordIndex's scores/scores_batch over these docs
+        # (e.g. a PersistentKeywordView); defaults to an in-memory KeywordIndex.
+        self.chunks = docs if isinstance(docs, ChunkStore) else ChunkStore.from_records(docs)
+        self.keyword_index = keyword_index or KeywordIndex(self.chunks.texts())
+        self._ordinals = {chunk_id: i for i, chunk_id in enumerate(self.chunks.ids) if chunk_id}
+        self._metadata_columns: dict[str, np.ndarray] = {}
+
+    @property
+    def chunk_ids(self) -> list[str]:
+        return list(self._ordinals)
 
     def keyword_scores(self, query: str) -> list[float]:
-        if not self.bm25:
-            return [0.0] * len(self.docs)
-        return self.bm25.get_scores(query.lower().split()).tolist()
+        return self.keyword_index.scores(query).tolist()
+
+    def keyword_scores_batch(self, queries: list[str]) -> np.ndarray:
+        return self.keyword_index.scores_batch(queries)
+
+    def filter_mask(self, metadata_filter: Optional[dict]) -> np.ndarray:
+        mask = np.ones(len(self.chunks), dtype=bool)
+        for key, value in (metadata_filter or {}).items():
+            column = self._metadata_columns.get(key)
+            if column is None:
+                column = np.empty(len(self.chunks), dtype=object)
+                column[:] = [self.chunks.metadata_value(i, key) for i in range(len(self.chunks))]
+                self._metadata_columns[key] = column
+            mask &= column == value
+        return mask
+
+    def vector_scores(self, vector_hits) -> np.ndarray:
+        """Min-max normalized vector scores scattered onto chunk ordinals (0 for chunks not hit)."""
+        scores = np.zeros(len(self.chunks), dtype=np.float64)
+        if not vector_hits:
+            return scores
+
+        # Hits outside this corpus (e.g. older points of the namespace) must not set the normalization bounds.
+        ordinals: list[int] = []
+        raw: list[float] = []
+        for hit in vector_hits:
+            ordinal = self._ordinals.get(str(getattr(hit, "id", "")))
+            if ordinal is not None:
+                ordinals.append(ordinal)
+                raw.append(float(hit.score))
+        if ordinals:
+            scores[ordinals] = _normalize_array(np.array(raw, dtype=np.float64))
+        return scores
+
+
+def _normalize_array(values: np.ndarray) -> np.ndarray:
+    if not len(values):
+        return values
+    v_min = values.min()
+    v_max = values.max()
+    if v_max == v_min:
+        return np.ones_like(values)
+    return (values - v_min) / (v_max - v_min)
+
+
+def _top_k(scores: np.ndarray, mask: np.ndarray, top_k: int) -> np.ndarray:
+    candidates = np.flatnonzero(mask & (scores > 0))
+    if len(candidates) > top_k:
+        keep = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+        candidates = np.sort(candidates[keep])
+    # Highest score first; ties keep corpus order.
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
 
 
-def _normalize(values: list[float]) -> list[float]:
-    if not values:
+def _fuse(
+    retriever: HybridRetriever,
+    vector_hits,
+    keyword_scores: np.ndarray,
+    top_k: int,
+    metadata_filter: dict | None,
+    vector_weight: float,
+    keyword_weight: float,
+) -> list[HybridHit]:
+    chunks = retriever.chunks
+    if not len(chunks) or top_k <= 0:
         return []
-    v_min = min(values)
-    v_max = max(values)
-    if v_max == v_min:
-        return [1.0 for _ in values]
-    return [(v - v_min) / (v_max - v_min) for v in values]
+
+    combined = (vector_weight * retriever.vector_scores(vector_hits)) + (
+        keyword_weight * _normalize_array(keyword_scores)
+    )
+    hits: list[HybridHit] = []
+    for ordinal in _top_k(combined, retriever.filter_mask(metadata_filter), top_k):
+        hits.append(
+            HybridHit(
+                source=chunks.source(ordinal),
+                score=float(combined[ordinal]),
+                content=chunks.text(ordinal),
+                metadata=chunks.metadata(ordinal),
+            )
+        )
+    return hits
 
 
 def hybrid_search(
     vector_hits,
-    docs: list[dict],
+    docs: ChunkStore | list[dict] | HybridRetriever,
     query: str,
     top_k: int = 8,
     metadata_filter: dict | None = None,
     vector_weight: float = 0.7,
     keyword_weight: float = 0.3,
 ) -> list[HybridHit]:
-    retriever = HybridRetriever(docs)
-    bm25_scores = retriever.keyword_scores(query)
-    normalized_bm25 = _normalize([float(s) for s in bm25_scores])
-
-    id_to_vector_score: dict[tuple[str, str], float] = {}
-    vector_raw_scores: list[float] = []
-
-    for hit in vector_hits:
-        payload = hit.payload or {}
-        key = (payload.get("source", "unknown"), payload.get("content", ""))
-        raw_score = float(hit.score)
-        id_to_vector_score[key] = raw_score
-        vector_raw_scores.append(raw_score)
-
-    vector_norm_map: dict[tuple[str, str], float] = {}
-    vector_norm_values = _normalize(vector_raw_scores)
-    for i, hit in enumerate(vector_hits):
-        payload = hit.payload or {}
-        key = (payload.get("source", "unknown"), payload.get("content", ""))
-        vector_norm_map[key] = vector_norm_values[i] if i < len(vector_norm_values) else 0.0
-
-    combined: list[HybridHit] = []
-    for idx, doc in enumerate(docs):
-        metadata = doc.get("metadata", {})
-        if metadata_filter:
-            is_match = True
-            for key, value in metadata_filter.items():
-                if metadata.get(key) != value:
-                    is_match = False
-                    break
-            if not is_match:
-                continue
-
-        key = (doc.get("source", "unknown"), doc.get("content", ""))
-        vector_component = vector_norm_map.get(key, 0.0)
-        keyword_component = normalized_bm25[idx] if idx < len(normalized_bm25) else 0.0
-        score = (vector_weight * vector_component) + (keyword_weight * keyword_component)
-
-        if score <= 0:
-            continue
-
-        combined.append(
-            HybridHit(
-                source=doc.get("source", "unknown"),
-                score=score,
-                content=doc.get("content", ""),
-                metadata=metadata,
-            )
-        )
+    retriever = docs if isinstance(docs, HybridRetriever) else HybridRetriever(docs)
+    keyword_scores = retriever.keyword_index.scores(query)
+    return _fuse(retriever, vector_hits, keyword_scores, top_k, metadata_filter, vector_weight, keyword_weight)
+
+
+def hybrid_search_batch(
+    vector_hits_per_query: list,
+    retriever: HybridRetriever,
+    specs: list[RetrievalSpec],
+    vector_weight: float = 0.7,
+    keyword_weight: float = 0.3,
+) -> list[list[HybridHit]]:
+    keyword_scores = retriever.keyword_scores_batch([spec.query for spec in specs])
+    return [
+        _fuse(retriever, vector_hits, scores, spec.top_k, spec.metadata_filter, vector_weight, keyword_weight)
+        for vector_hits, scores, spec in zip(vector_hits_per_query, keyword_scores, specs)
+    ]
+
+
+def retrieve_batch(embedder, store, retriever: HybridRetriever, specs: list[RetrievalSpec]) -> list[list[HybridHit]]:
+    """
+    Answers several retrieval specs together: one query-encoding call,
+    one batched vector search (restricted to the retriever's chunks) and one
+    keyword-scoring pass.
+    """
+    if not specs:
+        return []
 
-    combined.sort(key=lambda x: x.score, reverse=True)
-    return combined[:top_k]
+    query_vectors = embedder.embed_queries([spec.query for spec in specs])
+    vector_hits = store.search_batch(
+        query_vectors,
+        top_ks=[max(spec.top_k * 2, 12) for spec in specs],
+        metadata_filters=[spec.metadata_filter for spec in specs],
+        point_ids=retriever.chunk_ids,
+    )
+    return hybrid_search_batch(vector_hits, retriever, specs)
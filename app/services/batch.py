@@ -0,0 +1,217 @@
+"""
+Offline bulk runner: analyzes startups from a CSV or JSONL file across worker
+processes and appends one JSON line per startup to an output file.
+
+    python -m app.services.batch startups.csv --output results.jsonl --workers 4
+
+CSV files need `startup_name` and `website_url` columns; `max_news_articles` and
+`public_pdf_urls` (separated by `;`) are optional. Re-running with the same
+output file skips startups that already completed successfully and input rows
+that were already reported as invalid.
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+from typing import Iterator, Optional
+
+from pydantic import ValidationError
+
+from app.config.settings import get_settings
+from app.embeddings.registry import preload_embedding_model
+from app.ingestion.http_client import create_http_client
+from app.models.schemas import AnalyzeStartupRequest, BatchAnalyzeResult
+from app.services.pipeline import run_analysis
+from app.services.result_cache import request_fingerprint
+
+
+settings = get_settings()
+
+
+def _read_rows(path: str) -> Iterator[tuple[dict, Optional[str], str]]:
+    """Yield (row, parse_error, raw_row) triples so one bad line never aborts the batch."""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line in handle:
+                raw = line.strip()
+                if not raw:
+                    continue
+                try:
+                    row = json.loads(raw)
+                except json.JSONDecodeError as exc:
+                    yield {}, f"malformed JSON ({exc.msg})", raw
+                    continue
+                yield (row, None, raw) if isinstance(row, dict) else ({}, "expected a JSON object", raw)
+            return
+
+        for row in csv.DictReader(handle):
+            item: dict = {"startup_name": row.get("startup_name", ""), "website_url": row.get("website_url", "")}
+            error = None
+            if row.get("max_news_articles"):
+                try:
+                    item["max_news_articles"] = int(row["max_news_articles"])
+                except ValueError:
+                    error = f"max_news_articles is not an integer: {row['max_news_articles']!r}"
+            if row.get("public_pdf_urls"):
+                item["public_pdf_urls"] = [u.strip() for u in row["public_pdf_urls"].split(";") if u.strip()]
+            yield item, error, json.dumps(row, sort_keys=True)
+
+
+def _invalid_row_fingerprint(raw_row: str) -> str:
+    # Keyed by content rather than position, so edits elsewhere in the file keep resumes accurate.
+    return "invalid:" + hashlib.sha256(raw_row.encode("utf-8")).hexdigest()
+
+
+def load_requests(path: str) -> tuple[list[tuple[int, AnalyzeStartupRequest]], list[tuple[str, BatchAnalyzeResult]]]:
+    """
+    Parse the input file; every result keeps the row's position in the file as its index.
+    Invalid rows come with the fingerprint their error record is stored under.
+    """
+    requests: list[tuple[int, AnalyzeStartupRequest]] = []
+    invalid: list[tuple[str, BatchAnalyzeResult]] = []
+    for index, (row, error, raw_row) in enumerate(_read_rows(path)):
+        if error is None:
+            try:
+                requests.append((index, AnalyzeStartupRequest(**row)))
+                continue
+            except ValidationError as exc:
+                error = exc.errors()[0]["msg"]
+        invalid.append(
+            (
+                _invalid_row_fingerprint(raw_row),
+                BatchAnalyzeResult(
+                    index=index,
+                    startup_name=str(row.get("startup_name", "")),
+                    status="error",
+                    error=f"Invalid input row: {error}",
+                ),
+            )
+        )
+    return requests, invalid
+
+
+def completed_fingerprints(output_path: str) -> set[str]:
+    if not os.path.exists(output_path):
+        return set()
+
+    done: set[str] = set()
+    with open(output_path, encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-write can leave a truncated last line; that startup is simply re-run.
+                continue
+            fingerprint = record.get("fingerprint")
+            if fingerprint and (record.get("status") == "ok" or fingerprint.startswith("invalid:")):
+                done.add(fingerprint)
+    return done
+
+
+def _init_worker(model_name: str) -> None:
+    preload_embedding_model(model_name)
+
+
+async def _analyze(payload: AnalyzeStartupRequest):
+    async with create_http_client() as client:
+        return await run_analysis(payload, http_client=client)
+
+
+def _run_one(index: int, payload_json: str) -> tuple[dict, float]:
+    payload = AnalyzeStartupRequest.model_validate_json(payload_json)
+    started = perf_counter()
+    try:
+        response = asyncio.run(_analyze(payload))
+        result = BatchAnalyzeResult(index=index, startup_name=payload.startup_name, status="ok", response=response)
+    except Exception as exc:
+        result = BatchAnalyzeResult(
+            index=index,
+            startup_name=payload.startup_name,
+            status="error",
+            error=str(exc) or exc.__class__.__name__,
+        )
+    return result.model_dump(mode="json"), perf_counter() - started
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+def run_batch(input_path: str, output_path: str, workers: int) -> dict:
+    requests, invalid = load_requests(input_path)
+    done = completed_fingerprints(output_path)
+    pending = [(i, r) for i, r in requests if request_fingerprint(r) not in done]
+    new_invalid = [(f, r) for f, r in invalid if f not in done]
+
+    latencies: list[float] = []
+    succeeded = 0
+    failed = len(new_invalid)
+    started = perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        for fingerprint, result in new_invalid:
+            record = result.model_dump(mode="json")
+            record["fingerprint"] = fingerprint
+            out.write(json.dumps(record) + "\n")
+        out.flush()
+
+        with ProcessPoolExecutor(
+            max_workers=max(1, workers),
+            initializer=_init_worker,
+            initargs=(settings.embedding_model,),
+        ) as pool:
+            futures = {pool.submit(_run_one, i, r.model_dump_json()): r for i, r in pending}
+            for future in as_completed(futures):
+                record, latency = future.result()
+                record["fingerprint"] = request_fingerprint(futures[future])
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+
+                latencies.append(latency)
+                if record["status"] == "ok":
+                    succeeded += 1
+                else:
+                    failed += 1
+                print(
+                    f"[{succeeded + failed - len(new_invalid)}/{len(pending)}] {record['startup_name']}: "
+                    f"{record['status']} ({latency:.1f}s)",
+                    file=sys.stderr,
+                )
+
+    elapsed = perf_counter() - started
+    return {
+        "total": len(requests) + len(invalid),
+        "skipped": len(requests) - len(pending) + len(invalid) - len(new_invalid),
+        "succeeded": succeeded,
+        "failed": failed,
+        "elapsed_seconds": round(elapsed, 2),
+        "throughput_per_minute": round(len(pending) / elapsed * 60, 2) if elapsed and pending else 0.0,
+        "latency_p50_seconds": round(_percentile(latencies, 0.5), 2),
+        "latency_p95_seconds": round(_percentile(latencies, 0.95), 2),
+        "latency_max_seconds": round(max(latencies, default=0.0), 2),
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run VentureLens analyses in bulk.")
+    parser.add_argument("input", help="CSV or JSONL file of startups")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL file to append results to")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.input, args.output, args.workers)
+    print(json.dumps(summary, indent=2))
+    return 0 if summary["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+from uuid import uuid4
+
+from app.models.schemas import AnalysisJob, AnalyzeStartupRequest, AnalyzeStartupResponse, SourceStatus
+from app.services.pipeline import ProgressCallback
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger("venturelens.jobs")
+
+JobRunner = Callable[[AnalyzeStartupRequest, ProgressCallback], Awaitable[AnalyzeStartupResponse]]
+
+
+class JobQueueFull(Exception):
+    def __init__(self, retry_after_seconds: int) -> None:
+        super().__init__("Analysis queue is full.")
+        self.retry_after_seconds = retry_after_seconds
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobManager:
+    """
+    Runs analyses in the background on a fixed number of worker tasks fed by a
+    bounded queue. Finished jobs are kept for `result_ttl_seconds`.
+    """
+
+    def __init__(self, runner: JobRunner, workers: int, queue_size: int, result_ttl_seconds: float) -> None:
+        self.runner = runner
+        self.workers = max(1, workers)
+        self.result_ttl_seconds = result_ttl_seconds
+        self._queue: asyncio.Queue[tuple[AnalysisJob, AnalyzeStartupRequest]] = asyncio.Queue(maxsize=max(1, queue_size))
+        self._jobs: dict[str, AnalysisJob] = {}
+        self._expires_at: dict[str, float] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._avg_duration_seconds = 30.0
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def retry_after_seconds(self) -> int:
+        backlog = self._queue.qsize() / self.workers
+        return max(1, int(backlog * self._avg_duration_seconds))
+
+    def submit(self, payload: AnalyzeStartupRequest) -> AnalysisJob:
+        self._purge_expired()
+        job = AnalysisJob(job_id=uuid4().hex, status="queued", created_at=_now())
+        try:
+            self._queue.put_nowait((job, payload))
+        except asyncio.QueueFull:
+            raise JobQueueFull(self.retry_after_seconds()) from None
+        self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        self._purge_expired()
+        return self._jobs.get(job_id)
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        for job_id in [job_id for job_id, expires in self._expires_at.items() if expires <= now]:
+            self._jobs.pop(job_id, None)
+            self._expires_at.pop(job_id, None)
+
+    @staticmethod
+    def _progress(job: AnalysisJob) -> ProgressCallback:
+        def on_event(event: str, data: dict) -> None:
+            if event == "source":
+                job.sources.append(SourceStatus(**data))
+            elif event == "stage":
+                if data["status"] == "started":
+                    job.current_stage = data["stage"]
+                else:
+                    job.stage_timings_ms[data["stage"]] = data["elapsed_ms"]
+                    if "points_per_second" in data:
+                        job.indexing_points_per_second = data["points_per_second"]
+                    if "duplicates_removed" in data:
+                        job.duplicates_removed = data["duplicates_removed"]
+                    if "embedding_ms_saved" in data:
+                        job.embedding_ms_saved = data["embedding_ms_saved"]
+
+        return on_event
+
+    async def _worker(self) -> None:
+        while True:
+            job, payload = await self._queue.get()
+            job.status = "running"
+            job.started_at = _now()
+            started = time.monotonic()
+            try:
+                job.result = await self.runner(payload, self._progress(job))
+                job.status = "succeeded"
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Cancelled during shutdown."
+                raise
+            except Exception as exc:
+                logger.exception("job_failed job_id=%s", job.job_id)
+                job.status = "failed"
+                job.error = str(exc) or exc.__class__.__name__
+            finally:
+                duration = time.monotonic() - started
+                self._avg_duration_seconds = (0.8 * self._avg_duration_seconds) + (0.2 * duration)
+                job.current_stage = None
+                job.finished_at = _now()
+                self._expires_at[job.job_id] = time.monotonic() + self.result_ttl_seconds
+                self._queue.task_done()
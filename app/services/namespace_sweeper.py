@@ -0,0 +1,54 @@
+import asyncio
+from typing import Optional
+
+from app.retrieval.inverted_index import get_inverted_index
+from app.retrieval.qdrant_client import open_vector_store
+from app.utils.executors import run_blocking
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger("venturelens.sweeper")
+
+
+class NamespaceSweeper:
+    """
+    Periodically deletes vector points (and their keyword postings) whose
+    namespace has not been re-indexed within `ttl_seconds`.
+    """
+
+    def __init__(self, ttl_seconds: float, interval_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep(self) -> int:
+        store = await run_blocking(open_vector_store)
+        expired = await run_blocking(store.delete_expired, self.ttl_seconds)
+        inverted_index = get_inverted_index()
+        if expired and inverted_index is not None:
+            await run_blocking(inverted_index.remove_documents, expired)
+        if expired:
+            logger.info("namespace_sweep deleted_points=%s", len(expired))
+        return len(expired)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.sweep()
+            except Exception as exc:
+                logger.warning("namespace_sweep_failed error=%s", exc)
+
+    def start(self) -> None:
+        if self._task is None and self.ttl_seconds > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
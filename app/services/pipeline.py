@@ -1,4 +1,10 @@
+import asyncio
+import re
+from contextlib import contextmanager
 from time import perf_counter
+from typing import Awaitable, Callable, Iterator, Optional
+
+import httpx
 
 from app.agents import (
     run_competition_agent,
@@ -8,21 +14,36 @@ from app.agents import (
     synthesize_investment_memo,
 )
 from app.config.settings import get_settings
+from app.embeddings.batcher import EmbeddingBatcher
 from app.embeddings.embedder import BGEEmbedder
 from app.evaluation import evaluate_report
 from app.ingestion.news_scraper import scrape_news
 from app.ingestion.pdf_parser import parse_public_pdf
 from app.ingestion.web_scraper import scrape_website
-from app.models.schemas import AnalyzeStartupRequest, AnalyzeStartupResponse, RunMetrics
-from app.retrieval.chunker import chunk_documents
-from app.retrieval.qdrant_client import VentureQdrant
-from app.retrieval.search import hybrid_search
+from app.models.schemas import (
+    AnalyzeStartupRequest,
+    AnalyzeStartupResponse,
+    MemoSection,
+    RunMetrics,
+    SourceDocument,
+    SourceStatus,
+)
+from app.retrieval.chunker import build_chunk_store, chunk_tokenizer_for
+from app.retrieval.dedup import deduplicate_chunks
+from app.retrieval.inverted_index import PersistentKeywordView, get_inverted_index
+from app.retrieval.qdrant_client import VentureQdrant, open_vector_store
+from app.retrieval.search import HybridRetriever, RetrievalSpec, retrieve_batch
+from app.utils.executors import run_blocking
 from app.utils.logger import setup_logger
 
 
 settings = get_settings()
 logger = setup_logger("venturelens.pipeline")
 
+# Receives (event, data) pairs as the pipeline progresses: "source" per ingested
+# source, "stage" when a stage starts/completes and "section" per finished memo section.
+ProgressCallback = Callable[[str, dict], None]
+
 
 def _estimate_tokens(char_count: int) -> int:
     # Lightweight heuristic for English text in absence of provider tokenizers.
@@ -33,94 +54,287 @@ def _estimate_cost_usd(input_tokens: int, price_per_million: float = 0.15) -> fl
     return round((input_tokens / 1_000_000) * price_per_million, 6)
 
 
-async def run_analysis(payload: AnalyzeStartupRequest) -> AnalyzeStartupResponse:
-    start_time = perf_counter()
+def _elapsed_ms(started: float) -> int:
+    return int((perf_counter() - started) * 1000)
 
-    docs = []
 
-    website_docs = await scrape_website(str(payload.website_url))
-    docs.extend(website_docs)
+def _ignore_event(event: str, data: dict) -> None:
+    return None
 
-    news_docs = await scrape_news(payload.startup_name, payload.max_news_articles)
-    docs.extend(news_docs)
 
-    for pdf_url in payload.public_pdf_urls:
-        pdf_docs = await parse_public_pdf(str(pdf_url))
-        docs.extend(pdf_docs)
-
-    chunked_docs = chunk_documents(docs, max_chunk_size=settings.max_chunk_size, overlap=settings.chunk_overlap)
-    if not chunked_docs:
-        raise ValueError("No documents extracted from provided sources.")
-
-    embedder = BGEEmbedder(settings.embedding_model)
-    texts = [d.content for d in chunked_docs]
-    vectors = embedder.embed_texts(texts)
-    vector_size = len(vectors[0])
-
-    qdrant = VentureQdrant(
-        collection_name=settings.qdrant_collection,
-        vector_size=vector_size,
-        qdrant_url=settings.qdrant_url,
-        qdrant_api_key=settings.qdrant_api_key,
-        local_path=settings.qdrant_local_path,
+@contextmanager
+def _stage(name: str, timings: dict[str, int], emit: ProgressCallback) -> Iterator[dict]:
+    # Yields a dict the stage can fill with counters for its "completed" event.
+    emit("stage", {"stage": name, "status": "started"})
+    started = perf_counter()
+    details: dict = {}
+    yield details
+    timings[name] = _elapsed_ms(started)
+    emit("stage", {"stage": name, "status": "completed", "elapsed_ms": timings[name], **details})
+
+
+def _emit_section(emit: ProgressCallback, name: str, section: MemoSection) -> None:
+    emit("section", {"name": name, "section": section.model_dump(mode="json")})
+
+
+async def _ingest_source(
+    semaphore: asyncio.Semaphore,
+    source: str,
+    source_type: str,
+    fetch: Callable[[], Awaitable[list[SourceDocument]]],
+    emit: ProgressCallback,
+) -> tuple[list[SourceDocument], SourceStatus]:
+    docs, status = await _fetch_source(semaphore, source, source_type, fetch)
+    emit("source", status.model_dump(mode="json"))
+    return docs, status
+
+
+async def _fetch_source(
+    semaphore: asyncio.Semaphore,
+    source: str,
+    source_type: str,
+    fetch: Callable[[], Awaitable[list[SourceDocument]]],
+) -> tuple[list[SourceDocument], SourceStatus]:
+    async with semaphore:
+        started = perf_counter()
+        try:
+            docs = await asyncio.wait_for(fetch(), timeout=settings.ingestion_source_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("ingestion_timeout type=%s source=%s", source_type, source)
+            return [], SourceStatus(
+                source=source,
+                type=source_type,
+                status="timeout",
+                latency_ms=_elapsed_ms(started),
+                error=f"Timed out after {settings.ingestion_source_timeout_seconds}s",
+            )
+        except Exception as exc:
+            logger.warning("ingestion_failed type=%s source=%s error=%s", source_type, source, exc)
+            return [], SourceStatus(
+                source=source,
+                type=source_type,
+                status="failed",
+                latency_ms=_elapsed_ms(started),
+                error=str(exc) or exc.__class__.__name__,
+            )
+
+    return docs, SourceStatus(
+        source=source,
+        type=source_type,
+        status="ok",
+        documents=len(docs),
+        latency_ms=_elapsed_ms(started),
     )
 
-    indexed_count = qdrant.upsert_documents(chunked_docs, vectors)
 
-    docs_index = [
-        {
-            "source": d.source,
-            "content": d.content,
-            "metadata": d.metadata,
-            "type": d.type,
-        }
-        for d in chunked_docs
+async def ingest_sources(
+    payload: AnalyzeStartupRequest,
+    http_client: Optional[httpx.AsyncClient] = None,
+    on_event: Optional[ProgressCallback] = None,
+) -> tuple[list[SourceDocument], list[SourceStatus]]:
+    """
+    Fetches website, news and PDF sources concurrently.
+    Failed or timed-out sources are dropped and reported in the returned statuses.
+    """
+    emit = on_event or _ignore_event
+    semaphore = asyncio.Semaphore(max(1, settings.ingestion_concurrency))
+    website_url = str(payload.website_url)
+
+    jobs = [
+        _ingest_source(
+            semaphore,
+            website_url,
+            "website",
+            lambda: scrape_website(website_url, client=http_client),
+            emit,
+        ),
+        _ingest_source(
+            semaphore,
+            "google_news",
+            "news",
+            lambda: scrape_news(payload.startup_name, payload.max_news_articles, client=http_client),
+            emit,
+        ),
     ]
+    for pdf_url in payload.public_pdf_urls:
+        jobs.append(
+            _ingest_source(
+                semaphore,
+                str(pdf_url),
+                "pdf",
+                lambda url=str(pdf_url): parse_public_pdf(url, client=http_client),
+                emit,
+            )
+        )
+
+    docs: list[SourceDocument] = []
+    statuses: list[SourceStatus] = []
+    for source_docs, status in await asyncio.gather(*jobs):
+        docs.extend(source_docs)
+        statuses.append(status)
+    return docs, statuses
+
 
-    def retrieve(query: str, metadata_filter: dict | None = None, top_k: int = 8):
-        q_vector = embedder.embed_query(query)
-        vector_hits = qdrant.search(query_vector=q_vector, top_k=max(top_k * 2, 12), metadata_filter=metadata_filter)
-        return hybrid_search(
-            vector_hits=vector_hits,
-            docs=docs_index,
-            query=query,
-            top_k=top_k,
-            metadata_filter=metadata_filter,
+def startup_namespace(startup_name: str) -> str:
+    # One vector-store namespace per startup: searches stay scoped and re-runs share chunks.
+    return re.sub(r"[^a-z0-9]+", "-", startup_name.lower()).strip("-") or "default"
+
+
+async def run_analysis(
+    payload: AnalyzeStartupRequest,
+    http_client: Optional[httpx.AsyncClient] = None,
+    on_event: Optional[ProgressCallback] = None,
+    embedding_batcher: Optional[EmbeddingBatcher] = None,
+) -> AnalyzeStartupResponse:
+    emit = on_event or _ignore_event
+    start_time = perf_counter()
+    stage_timings: dict[str, int] = {}
+    namespace = startup_namespace(payload.startup_name)
+
+    with _stage("ingestion", stage_timings, emit):
+        docs, source_statuses = await ingest_sources(payload, http_client=http_client, on_event=emit)
+
+    with _stage("chunking", stage_timings, emit) as stage:
+        tokenizer = await run_blocking(chunk_tokenizer_for, settings.embedding_model, settings.chunk_max_tokens)
+        chunks = await run_blocking(
+            build_chunk_store,
+            docs,
+            tokenizer,
+            overlap_tokens=settings.chunk_overlap_tokens,
+            namespace=namespace,
         )
+        if not len(chunks):
+            failed = [f"{s.source} ({s.status})" for s in source_statuses if s.status != "ok"]
+            detail = f" Failed sources: {', '.join(failed)}." if failed else ""
+            raise ValueError(f"No documents extracted from provided sources.{detail}")
+        stage["chunks"] = len(chunks)
 
-    market_hits = retrieve(f"{payload.startup_name} ai market trends demand segments", top_k=8)
-    competition_hits = retrieve(f"{payload.startup_name} competitors alternatives differentiation moat", top_k=8)
-    traction_hits = retrieve(f"{payload.startup_name} users customers funding partnerships growth", top_k=8)
-    risk_hits = retrieve(f"{payload.startup_name} risk legal compliance security reliability", top_k=8)
-
-    market = run_market_agent(payload.startup_name, market_hits)
-    competition = run_competition_agent(payload.startup_name, competition_hits)
-    traction = run_traction_agent(payload.startup_name, traction_hits)
-    risk = run_risk_agent(payload.startup_name, risk_hits)
-
-    report = synthesize_investment_memo(
-        startup_name=payload.startup_name,
-        market=market,
-        competition=competition,
-        traction=traction,
-        risk=risk,
-    )
+    duplicates_removed = 0
+    if settings.dedup_enabled:
+        with _stage("dedup", stage_timings, emit) as stage:
+            chunks, duplicates_removed = await run_blocking(deduplicate_chunks, chunks, settings.dedup_threshold)
+            stage["duplicates_removed"] = duplicates_removed
+
+    with _stage("embedding", stage_timings, emit) as stage:
+        embedder = BGEEmbedder(settings.embedding_model)
+        texts = chunks.texts()
+        chunk_ids = chunks.ids
+
+        # Transformer vectors are corpus-independent, so chunks already in the collection
+        # keep their stored vectors. TF-IDF must be fit on the full corpus every run.
+        qdrant: Optional[VentureQdrant] = None
+        existing: set[str] = set()
+        if embedder.uses_transformer:
+            qdrant = await run_blocking(open_vector_store, embedder.dimension, namespace)
+            existing = await run_blocking(qdrant.existing_ids, list(dict.fromkeys(chunk_ids)))
+        pending = [i for i, chunk_id in enumerate(chunk_ids) if chunk_id not in existing]
+        pending_texts = [texts[i] for i in pending]
+
+        encode_started = perf_counter()
+        if not pending_texts:
+            vectors = []
+        elif embedding_batcher is not None and embedding_batcher.enabled:
+            vectors = await embedding_batcher.embed(pending_texts)
+        else:
+            vectors = await run_blocking(embedder.embed_texts, pending_texts)
+        # Duplicates would have cost about as much per chunk to encode as the chunks actually encoded.
+        embedding_ms_saved = int(_elapsed_ms(encode_started) * duplicates_removed / len(pending)) if pending else 0
+        stage["vectors"] = len(vectors)
+        stage["reused"] = len(chunks) - len(pending)
+        stage["embedding_ms_saved"] = embedding_ms_saved
+
+    with _stage("indexing", stage_timings, emit) as stage:
+        if qdrant is None:
+            # TF-IDF vectors are refit on every run, so they never join the shared collection.
+            qdrant = await run_blocking(open_vector_store, len(vectors[0]), namespace, True)
+        if existing:
+            await run_blocking(qdrant.touch, list(existing))
+        upsert_started = perf_counter()
+        if pending:
+            await run_blocking(qdrant.upsert_chunks, chunks.select(pending), vectors, settings.qdrant_upsert_wait)
+        indexed_count = len(chunks)
+
+        inverted_index = get_inverted_index()
+        if inverted_index is not None:
+            await run_blocking(inverted_index.add_documents, chunk_ids, texts)
+            retriever = HybridRetriever(chunks, keyword_index=PersistentKeywordView(inverted_index, chunk_ids))
+        else:
+            retriever = await run_blocking(HybridRetriever, chunks)
+
+        # Keyword indexing above overlaps with Qdrant applying unacknowledged upserts.
+        await run_blocking(qdrant.flush)
+        upsert_seconds = perf_counter() - upsert_started
+        points_per_second = round(len(pending) / upsert_seconds, 1) if pending and upsert_seconds > 0 else 0.0
+        stage["points"] = len(pending)
+        stage["points_per_second"] = points_per_second
+        memory = qdrant.memory_stats()
+        if memory:
+            stage["vector_bytes_per_point"] = memory["vector_bytes_per_point"]
+        ann_recall = await run_blocking(qdrant.ann_recall)
+        if ann_recall is not None:
+            stage["ann_recall_at_10"] = round(ann_recall, 3)
+        if len(vectors):
+            quantized_recall = await run_blocking(qdrant.quantization_recall, vectors)
+            if quantized_recall is not None:
+                stage["quantized_recall_at_10"] = round(quantized_recall, 3)
+
+    specs = [
+        RetrievalSpec(f"{payload.startup_name} ai market trends demand segments", top_k=8),
+        RetrievalSpec(f"{payload.startup_name} competitors alternatives differentiation moat", top_k=8),
+        RetrievalSpec(f"{payload.startup_name} users customers funding partnerships growth", top_k=8),
+        RetrievalSpec(f"{payload.startup_name} risk legal compliance security reliability", top_k=8),
+    ]
+    with _stage("retrieval", stage_timings, emit):
+        market_hits, competition_hits, traction_hits, risk_hits = await run_blocking(
+            retrieve_batch,
+            embedder,
+            qdrant,
+            retriever,
+            specs,
+        )
+
+    with _stage("agents", stage_timings, emit):
+        # Each agent runs off the loop, so stream consumers get a section as soon as it is ready.
+        market = await run_blocking(run_market_agent, payload.startup_name, market_hits)
+        _emit_section(emit, "market", market)
+        competition = await run_blocking(run_competition_agent, payload.startup_name, competition_hits)
+        _emit_section(emit, "competition", competition)
+        traction = await run_blocking(run_traction_agent, payload.startup_name, traction_hits)
+        _emit_section(emit, "traction", traction)
+        risk = await run_blocking(run_risk_agent, payload.startup_name, risk_hits)
+        _emit_section(emit, "risk_assessment", risk)
+
+        report = await run_blocking(
+            synthesize_investment_memo,
+            startup_name=payload.startup_name,
+            market=market,
+            competition=competition,
+            traction=traction,
+            risk=risk,
+        )
+        _emit_section(emit, "business_model", report.business_model)
 
-    evaluation = evaluate_report(report)
+    with _stage("evaluation", stage_timings, emit):
+        evaluation = evaluate_report(report)
 
-    input_characters = sum(len(d.content) for d in chunked_docs)
+    input_characters = chunks.total_characters()
     estimated_input_tokens = _estimate_tokens(input_characters)
     metrics = RunMetrics(
         latency_ms=int((perf_counter() - start_time) * 1000),
         input_characters=input_characters,
         estimated_input_tokens=estimated_input_tokens,
         estimated_cost_usd=_estimate_cost_usd(estimated_input_tokens),
+        stage_timings_ms=stage_timings,
+        indexing_points_per_second=points_per_second,
+        duplicates_removed=duplicates_removed,
+        embedding_ms_saved=embedding_ms_saved,
     )
 
     logger.info(
-        "analysis_complete startup=%s sources=%s latency_ms=%s verdict=%s hallucination_risk=%.2f tokens=%s cost_usd=%.6f",
+        "analysis_complete startup=%s sources=%s failed_sources=%s latency_ms=%s verdict=%s hallucination_risk=%.2f tokens=%s cost_usd=%.6f",
         payload.startup_name,
         indexed_count,
+        sum(1 for s in source_statuses if s.status != "ok"),
         metrics.latency_ms,
         evaluation.judge_verdict,
         evaluation.hallucination_risk,
@@ -134,6 +348,7 @@ async def run_analysis(payload: AnalyzeStartupRequest) -> AnalyzeStartupResponse
         evaluation=evaluation,
         metrics=metrics,
         sources_indexed=indexed_count,
+        sources=source_statuses,
         notes="Phase 3 pipeline executed: evaluation + metrics logging enabled.",
     )
 
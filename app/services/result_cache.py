@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+from app.models.schemas import AnalyzeStartupRequest, AnalyzeStartupResponse
+from app.services.pipeline import ProgressCallback
+from app.services.singleflight import SingleFlight
+from app.utils.logger import setup_logger
+
+
+logger = setup_logger("venturelens.result_cache")
+
+Runner = Callable[[ProgressCallback], Awaitable[AnalyzeStartupResponse]]
+
+
+def request_fingerprint(payload: AnalyzeStartupRequest) -> str:
+    normalized = {
+        "startup_name": " ".join(payload.startup_name.split()).casefold(),
+        "website_url": str(payload.website_url).rstrip("/"),
+        "max_news_articles": payload.max_news_articles,
+        "public_pdf_urls": sorted({str(url).rstrip("/") for url in payload.public_pdf_urls}),
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    In-process cache of analysis responses keyed by request fingerprint.
+    Entries younger than `ttl_seconds` are served as-is; for a further
+    `stale_seconds` the stale copy is served while a background refresh runs.
+    Misses and refreshes for the same key share one pipeline run; progress events
+    of that run go to every caller waiting on it (from the moment it joined).
+    """
+
+    def __init__(self, ttl_seconds: float, stale_seconds: float, max_entries: int = 256) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[AnalyzeStartupResponse, float]] = OrderedDict()
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self._flights: SingleFlight[AnalyzeStartupResponse] = SingleFlight()
+        self._listeners: dict[str, list[ProgressCallback]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, key: str) -> Optional[tuple[AnalyzeStartupResponse, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        response, stored_at = entry
+        age = time.time() - stored_at
+        if age >= self.ttl_seconds + self.stale_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response, age
+
+    def put(self, key: str, response: AnalyzeStartupResponse) -> None:
+        if not self.enabled:
+            return
+        self._entries[key] = (response, time.time())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _broadcast(self, key: str) -> ProgressCallback:
+        def emit(event: str, data: dict) -> None:
+            for listener in list(self._listeners.get(key, ())):
+                listener(event, data)
+
+        return emit
+
+    async def _run(self, key: str, runner: Runner, on_event: Optional[ProgressCallback] = None) -> AnalyzeStartupResponse:
+        if self._flights.in_flight(key):
+            logger.info("coalesced_analysis key=%s", key[:12])
+
+        async def run_and_store() -> AnalyzeStartupResponse:
+            response = await runner(self._broadcast(key))
+            self.put(key, response)
+            return response
+
+        if on_event is not None:
+            self._listeners.setdefault(key, []).append(on_event)
+        try:
+            return await self._flights.do(key, run_and_store)
+        finally:
+            if on_event is not None:
+                listeners = self._listeners[key]
+                listeners.remove(on_event)
+                if not listeners:
+                    del self._listeners[key]
+
+    async def _refresh(self, key: str, runner: Runner) -> None:
+        try:
+            await self._run(key, runner)
+        except Exception:
+            logger.exception("background_refresh_failed key=%s", key[:12])
+        finally:
+            self._refreshing.pop(key, None)
+
+    async def get_or_run(
+        self,
+        key: str,
+        runner: Runner,
+        force_refresh: bool = False,
+        on_event: Optional[ProgressCallback] = None,
+    ) -> AnalyzeStartupResponse:
+        if self.enabled and not force_refresh:
+            cached = self.get(key)
+            if cached is not None:
+                response, age = cached
+                if age >= self.ttl_seconds and key not in self._refreshing:
+                    self._refreshing[key] = asyncio.create_task(self._refresh(key, runner))
+                return response.model_copy(update={"cached": True, "cache_age_seconds": round(age, 3)})
+
+        return await self._run(key, runner, on_event)
+
+    async def close(self) -> None:
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refreshing.clear()
@@ -0,0 +1,71 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+from app.config.settings import get_settings
+
+
+settings = get_settings()
+
+T = TypeVar("T")
+
+_cpu_executor: Optional[Executor] = None
+_blocking_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def _cpu_workers() -> int:
+    return settings.cpu_executor_workers or max(1, os.cpu_count() or 1)
+
+
+def get_cpu_executor() -> Executor:
+    """
+    Pool for pure, picklable parsing functions (HTML, RSS, PDF).
+    Uses processes when CPU_EXECUTOR_KIND=process, threads otherwise.
+    """
+    global _cpu_executor
+    with _lock:
+        if _cpu_executor is None:
+            if settings.cpu_executor_kind == "process":
+                _cpu_executor = ProcessPoolExecutor(max_workers=_cpu_workers())
+            else:
+                _cpu_executor = ThreadPoolExecutor(max_workers=_cpu_workers(), thread_name_prefix="venturelens-cpu")
+        return _cpu_executor
+
+
+def get_blocking_executor() -> ThreadPoolExecutor:
+    """
+    Thread pool for blocking work on shared in-process state
+    (embedding model, keyword index, Qdrant client).
+    """
+    global _blocking_executor
+    with _lock:
+        if _blocking_executor is None:
+            _blocking_executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.blocking_executor_workers),
+                thread_name_prefix="venturelens-blocking",
+            )
+        return _blocking_executor
+
+
+async def run_cpu(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), partial(func, *args, **kwargs))
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_blocking_executor(), partial(func, *args, **kwargs))
+
+
+def shutdown_executors() -> None:
+    global _cpu_executor, _blocking_executor
+    with _lock:
+        for executor in (_cpu_executor, _blocking_executor):
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        _cpu_executor = None
+        _blocking_executor = None
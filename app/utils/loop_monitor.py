@@ -0,0 +1,51 @@
+import asyncio
+from collections import deque
+from typing import Optional
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a fixed-interval sleep.
+    Sustained lag means something is blocking the loop.
+    """
+
+    def __init__(self, interval_seconds: float = 0.1, window: int = 600) -> None:
+        self.interval_seconds = interval_seconds
+        self._samples: deque[float] = deque(maxlen=window)
+        self._max_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval_seconds
+            await asyncio.sleep(self.interval_seconds)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self._samples.append(lag_ms)
+            self._max_ms = max(self._max_ms, lag_ms)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def snapshot(self) -> dict:
+        if not self._samples:
+            return {"last_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0, "samples": 0}
+        ordered = sorted(self._samples)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return {
+            "last_ms": round(self._samples[-1], 2),
+            "p99_ms": round(p99, 2),
+            "max_ms": round(self._max_ms, 2),
+            "samples": len(ordered),
+        }
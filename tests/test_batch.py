@@ -0,0 +1,74 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from app.models.schemas import AnalyzeStartupRequest
+from app.services import batch
+from app.services.batch import completed_fingerprints, load_requests
+from app.services.result_cache import request_fingerprint
+
+
+def test_load_requests_from_csv_and_resume_from_output(tmp_path) -> None:
+    source = tmp_path / "startups.csv"
+    source.write_text(
+        "startup_name,website_url,max_news_articles,public_pdf_urls\n"
+        "Acme,https://acme.example.com,,https://acme.example.com/a.pdf;https://acme.example.com/b.pdf\n"
+        "X,not-a-url,,\n"
+        "Beta,https://beta.example.com,3,\n"
+        "Gamma,https://gamma.example.com,lots,\n"
+    )
+    requests, invalid = load_requests(str(source))
+
+    assert [(i, r.startup_name) for i, r in requests] == [(0, "Acme"), (2, "Beta")]
+    assert len(requests[0][1].public_pdf_urls) == 2
+    assert [r.index for _, r in invalid] == [1, 3]
+    assert "max_news_articles" in invalid[1][1].error
+
+    output = tmp_path / "results.jsonl"
+    acme = AnalyzeStartupRequest(**requests[0][1].model_dump())
+    output.write_text(
+        json.dumps({"fingerprint": request_fingerprint(acme), "status": "ok"})
+        + "\n"
+        + json.dumps({"fingerprint": request_fingerprint(requests[1][1]), "status": "error"})
+        + "\n"
+        + '{"fingerprint": "trunc'
+    )
+    assert completed_fingerprints(str(output)) == {request_fingerprint(acme)}
+
+
+def test_run_batch_keeps_row_indexes_and_resumes_without_duplicates(tmp_path, monkeypatch) -> None:
+    source = tmp_path / "startups.jsonl"
+    source.write_text(
+        json.dumps({"startup_name": "Bad", "website_url": "not-a-url"})
+        + "\n{not json\n"
+        + json.dumps({"startup_name": "Acme", "website_url": "https://acme.invalid"})
+        + "\n"
+    )
+    output = tmp_path / "results.jsonl"
+
+    def fake_run_one(index: int, payload_json: str) -> tuple[dict, float]:
+        payload = AnalyzeStartupRequest.model_validate_json(payload_json)
+        return {"index": index, "startup_name": payload.startup_name, "status": "ok"}, 0.01
+
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(batch, "_init_worker", lambda model_name: None)
+    monkeypatch.setattr(batch, "_run_one", fake_run_one)
+
+    first = batch.run_batch(str(source), str(output), workers=1)
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+
+    assert sorted((r["index"], r["status"]) for r in records) == [(0, "error"), (1, "error"), (2, "ok")]
+    assert (first["total"], first["succeeded"], first["failed"], first["skipped"]) == (3, 1, 2, 0)
+
+    second = batch.run_batch(str(source), str(output), workers=1)
+
+    assert len(output.read_text().splitlines()) == 3
+    assert (second["succeeded"], second["failed"], second["skipped"]) == (0, 0, 3)
+    assert batch.main([str(source), "-o", str(output), "-w", "1"]) == 0
+    assert len(output.read_text().splitlines()) == 3
+
+    # Inserting a row shifts every index; the already reported invalid rows are still skipped.
+    source.write_text(json.dumps({"startup_name": "Beta", "website_url": "https://beta.invalid"}) + "\n" + source.read_text())
+    third = batch.run_batch(str(source), str(output), workers=1)
+
+    assert (third["succeeded"], third["failed"], third["skipped"]) == (1, 0, 3)
+    assert json.loads(output.read_text().splitlines()[-1])["startup_name"] == "Beta"
@@ -0,0 +1,97 @@
+import asyncio
+
+import numpy as np
+
+from app.embeddings import registry
+from app.embeddings.batcher import EmbeddingBatcher
+from app.embeddings.cache import EmbeddingCache
+from app.embeddings.embedder import BGEEmbedder
+
+
+def test_model_is_loaded_once_and_tfidf_state_is_per_instance(monkeypatch) -> None:
+    loads: list[str] = []
+
+    def fake_load(model_name: str):
+        loads.append(model_name)
+        return None
+
+    registry.clear_embedding_models()
+    monkeypatch.setattr(registry, "_load_model", fake_load)
+
+    first = BGEEmbedder("test-model")
+    second = BGEEmbedder("test-model")
+    first.embed_texts(["alpha beta", "beta gamma"])
+
+    assert loads == ["test-model"]
+    assert first._vectorizer is not None
+    assert second._vectorizer is None
+    registry.clear_embedding_models()
+
+
+class _CountingModel:
+    def __init__(self) -> None:
+        self.encoded: list[str] = []
+
+    def encode(self, texts, normalize_embeddings=True):
+        self.encoded.extend(texts)
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+def test_embedding_cache_only_encodes_misses(tmp_path) -> None:
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), max_entries=100, dtype="float16")
+    embedder = BGEEmbedder("cached-model", cache=cache)
+    model = _CountingModel()
+    embedder._st_model = model
+
+    first = embedder.embed_texts(["alpha", "beta", "alpha"])
+    second = embedder.embed_texts(["beta", "gamma"])
+
+    assert model.encoded == ["alpha", "beta", "gamma"]
+    assert first[0].tolist() == first[2].tolist() == [5.0, 1.0]
+    assert second[0].tolist() == first[1].tolist()
+    assert cache.stats()["hits"] == 1
+
+    # float16 storage: a fresh vector equals what a later cache hit returns.
+    (fresh,) = embedder.embed_texts(["x" * 2049])
+    (cached,) = embedder.embed_texts(["x" * 2049])
+    assert fresh.dtype == cached.dtype == np.float32 and fresh.tolist() == cached.tolist() == [2048.0, 1.0]
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path) -> None:
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), max_entries=10, dtype="float32")
+    cache.put_many("m", [f"t{i}" for i in range(10)], np.ones((10, 4)))
+    # Rewriting cached keys (including duplicates in one batch) does not grow the count or evict.
+    cache.put_many("m", ["t1", "t1", "t2"], np.zeros((3, 4)))
+    assert cache.stats()["entries"] == 10 and all(v is not None for v in cache.get_many("m", ["t3", "t9"]))
+    cache.get_many("m", ["t0"])
+    cache.put_many("m", ["t10"], np.ones((1, 4)))
+
+    entries = cache.stats()["entries"]
+    assert entries <= 10 and entries == cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    assert cache.get_many("m", ["t0"])[0] is not None
+
+
+def test_batcher_coalesces_concurrent_requests() -> None:
+    batcher = EmbeddingBatcher("batched-model", max_batch_size=100, max_wait_ms=20)
+    model = _CountingModel()
+    calls: list[int] = []
+
+    def encode(texts, normalize_embeddings=True):
+        calls.append(len(texts))
+        return _CountingModel.encode(model, texts)
+
+    model.encode = encode
+    batcher._embedder._st_model = model
+    batcher._embedder._cache = None
+
+    async def scenario():
+        results = await asyncio.gather(batcher.embed(["a", "bb"]), batcher.embed(["ccc"]))
+        await asyncio.sleep(0)
+        return results
+
+    first, second = asyncio.run(scenario())
+
+    assert calls == [3]
+    assert not batcher._flush_tasks
+    assert first.tolist() == [[1.0, 1.0], [2.0, 1.0]]
+    assert second.tolist() == [[3.0, 1.0]]
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from app.ingestion import http_cache, news_scraper
+from app.utils.executors import run_blocking
+from app.utils.loop_monitor import LoopLagMonitor
+
+
+def test_run_blocking_runs_off_the_event_loop() -> None:
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+
+        def work() -> int:
+            time.sleep(0.2)
+            return threading.get_ident()
+
+        worker_thread = await run_blocking(work)
+        task.cancel()
+        return worker_thread, ticks
+
+    worker_thread, ticks = asyncio.run(scenario())
+    assert worker_thread != threading.get_ident()
+    # The loop kept running its other tasks while the work slept.
+    assert ticks >= 5
+
+
+def test_loop_lag_monitor_detects_a_blocked_loop() -> None:
+    async def scenario():
+        monitor = LoopLagMonitor(interval_seconds=0.01)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        await run_blocking(time.sleep, 0.2)
+        offloaded = monitor.snapshot()["max_ms"]
+        time.sleep(0.2)  # deliberately block the loop
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+        return offloaded, monitor.snapshot()
+
+    offloaded, snapshot = asyncio.run(scenario())
+    assert offloaded < 100
+    assert snapshot["max_ms"] >= 150 and snapshot["samples"] > 5
+
+
+def test_news_feed_is_parsed_off_the_event_loop(monkeypatch) -> None:
+    feed = b"<rss><channel><item><title>Acme raises seed</title><link>https://news.test/1</link></item></channel></rss>"
+    parse_threads: list[int] = []
+    parse_feed = news_scraper._parse_feed
+
+    def recording_parse_feed(*args):
+        parse_threads.append(threading.get_ident())
+        return parse_feed(*args)
+
+    monkeypatch.setattr(http_cache.settings, "http_cache_enabled", False)
+    monkeypatch.setattr(news_scraper, "_parse_feed", recording_parse_feed)
+
+    async def scenario():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=feed))
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await news_scraper.scrape_news("Acme", max_articles=3, client=client), threading.get_ident()
+
+    docs, loop_thread = asyncio.run(scenario())
+    assert [doc.source for doc in docs] == ["https://news.test/1"]
+    assert parse_threads and parse_threads[0] != loop_thread
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import date
+
+import httpx
+
+from app.ingestion.http_cache import HttpCache, fetch_documents
+from app.models.schemas import SourceDocument
+
+
+def test_conditional_get_skips_download_and_reparse(tmp_path) -> None:
+    requests: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(dict(request.headers))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return httpx.Response(200, content=b"deck body", headers={"etag": '"v1"'})
+
+    parses: list[str] = []
+
+    async def parse(response) -> list[SourceDocument]:
+        parses.append(response.text)
+        return [SourceDocument(source=response.url, type="pitch_deck_pdf", content=response.text)]
+
+    cache = HttpCache(str(tmp_path / "http.sqlite3"), max_bytes=1024, ttl_seconds={"pdf": 0.0})
+
+    async def run() -> tuple[list[SourceDocument], list[SourceDocument]]:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            first = await fetch_documents(client, "https://x.test/deck.pdf", "pdf", parse, cache=cache)
+            second = await fetch_documents(client, "https://x.test/deck.pdf", "pdf", parse, cache=cache)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert parses == ["deck body"]
+    assert requests[1]["if-none-match"] == '"v1"'
+    assert first[0].content == second[0].content == "deck body"
+
+
+def test_cache_serves_within_ttl_and_evicts_by_size(tmp_path) -> None:
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(str(request.url))
+        return httpx.Response(200, content=b"x" * 600)
+
+    cache = HttpCache(str(tmp_path / "http.sqlite3"), max_bytes=1000, ttl_seconds={"news": 60.0})
+
+    async def run() -> list[str]:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            a1 = await cache.fetch(client, "https://x.test/a", "news")
+            a2 = await cache.fetch(client, "https://x.test/a", "news")
+            await cache.fetch(client, "https://x.test/b", "news")
+            a3 = await cache.fetch(client, "https://x.test/a", "news")
+        return [a1.status, a2.status, a3.status]
+
+    assert asyncio.run(run()) == ["fetched", "fresh", "fetched"]
+    assert calls.count("https://x.test/a") == 2
+
+
+def test_failed_revalidation_serves_stale_body_with_current_fetch_metadata(tmp_path) -> None:
+    responses = [httpx.Response(200, content=b"feed body", headers={"etag": '"v1"'})]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if not responses:
+            raise httpx.ConnectError("unreachable", request=request)
+        return responses.pop(0)
+
+    parses: list[str] = []
+
+    async def parse(response) -> list[SourceDocument]:
+        parses.append(response.text)
+        return [SourceDocument(source=response.url, type="news", content=response.text, metadata={"date": "2000-01-01"})]
+
+    cache = HttpCache(str(tmp_path / "http.sqlite3"), max_bytes=1024, ttl_seconds={"news": 0.0})
+
+    async def run() -> list[list[SourceDocument]]:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            first = await fetch_documents(client, "https://x.test/rss", "news", parse, cache=cache)
+            responses.append(httpx.Response(503))
+            unavailable = await fetch_documents(client, "https://x.test/rss", "news", parse, cache=cache)
+            unreachable = await fetch_documents(client, "https://x.test/rss", "news", parse, cache=cache)
+        return [first, unavailable, unreachable]
+
+    first, unavailable, unreachable = asyncio.run(run())
+
+    assert parses == ["feed body"]
+    assert first[0].content == unavailable[0].content == unreachable[0].content == "feed body"
+    assert unavailable[0].metadata["date"] == unreachable[0].metadata["date"] == str(date.today())
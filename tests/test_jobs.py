@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from app.models.schemas import AnalyzeStartupRequest
+from app.services.jobs import JobManager, JobQueueFull
+
+
+PAYLOAD = AnalyzeStartupRequest(startup_name="Acme", website_url="https://acme.example.com")
+
+
+def test_jobs_record_progress_and_result() -> None:
+    async def runner(payload, on_event):
+        on_event("stage", {"stage": "ingestion", "status": "started"})
+        on_event("stage", {"stage": "ingestion", "status": "completed", "elapsed_ms": 3})
+        on_event("stage", {"stage": "dedup", "status": "completed", "elapsed_ms": 1, "duplicates_removed": 4})
+        on_event("stage", {"stage": "embedding", "status": "completed", "elapsed_ms": 9, "embedding_ms_saved": 2})
+        on_event("stage", {"stage": "indexing", "status": "completed", "elapsed_ms": 5, "points_per_second": 120.5})
+        return None
+
+    async def scenario():
+        manager = JobManager(runner, workers=1, queue_size=4, result_ttl_seconds=60)
+        manager.start()
+        job = manager.submit(PAYLOAD)
+        for _ in range(50):
+            if manager.get(job.job_id).status in {"succeeded", "failed"}:
+                break
+            await asyncio.sleep(0.01)
+        await manager.stop()
+        return manager.get(job.job_id)
+
+    job = asyncio.run(scenario())
+    assert job.status == "succeeded"
+    assert job.stage_timings_ms == {"ingestion": 3, "dedup": 1, "embedding": 9, "indexing": 5}
+    assert (job.indexing_points_per_second, job.duplicates_removed, job.embedding_ms_saved) == (120.5, 4, 2)
+    assert job.finished_at is not None
+
+
+def test_full_queue_raises_with_retry_after() -> None:
+    async def runner(payload, on_event):
+        await asyncio.sleep(1)
+
+    async def scenario():
+        manager = JobManager(runner, workers=1, queue_size=1, result_ttl_seconds=60)
+        manager.submit(PAYLOAD)
+        with pytest.raises(JobQueueFull) as exc_info:
+            manager.submit(PAYLOAD)
+        return exc_info.value.retry_after_seconds
+
+    assert asyncio.run(scenario()) >= 1
@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import threading
+
+import numpy as np
+
+from app.models.schemas import AnalyzeStartupRequest, SourceDocument
+from app.retrieval import qdrant_client
+from app.services import pipeline
+from app.services.namespace_sweeper import NamespaceSweeper
+
+
+def _website_docs(url: str) -> list[SourceDocument]:
+    return [
+        SourceDocument(
+            source=url,
+            type="website_paragraphs",
+            content="Acme builds AI agents for customers with strong growth and funding from partners.",
+            metadata={"category": "details"},
+        )
+    ]
+
+
+def test_ingestion_drops_failed_and_slow_sources(monkeypatch) -> None:
+    async def fake_website(url: str, client=None) -> list[SourceDocument]:
+        return _website_docs(url)
+
+    async def failing_news(startup_name: str, max_articles: int, client=None) -> list[SourceDocument]:
+        raise RuntimeError("rss down")
+
+    async def slow_pdf(url: str, client=None) -> list[SourceDocument]:
+        await asyncio.sleep(5)
+        return []
+
+    monkeypatch.setattr(pipeline, "scrape_website", fake_website)
+    monkeypatch.setattr(pipeline, "scrape_news", failing_news)
+    monkeypatch.setattr(pipeline, "parse_public_pdf", slow_pdf)
+    monkeypatch.setattr(pipeline.settings, "ingestion_source_timeout_seconds", 0.05)
+
+    payload = AnalyzeStartupRequest(
+        startup_name="Acme",
+        website_url="https://acme.example.com",
+        public_pdf_urls=["https://acme.example.com/deck.pdf"],
+    )
+    response = asyncio.run(pipeline.run_analysis(payload))
+
+    statuses = {s.type: s.status for s in response.sources}
+    assert statuses == {"website": "ok", "news": "failed", "pdf": "timeout"}
+    assert response.sources_indexed >= 1
+    assert "ingestion" in response.metrics.stage_timings_ms
+
+
+class _HashEmbedder:
+    """Stands in for a sentence-transformer: fixed width, corpus-independent vectors."""
+
+    uses_transformer = True
+    dimension = 16
+
+    def __init__(self, model_name: str, cache=None) -> None:
+        pass
+
+    def embed_texts(self, texts: list[str]) -> np.ndarray:
+        seeds = [int(hashlib.sha1(t.encode()).hexdigest()[:8], 16) for t in texts]
+        return np.asarray([np.random.default_rng(s).normal(size=16) for s in seeds], dtype=np.float32)
+
+    embed_queries = embed_texts
+
+
+def test_pipeline_writes_to_shared_store_that_the_sweeper_expires(monkeypatch) -> None:
+    async def fake_website(url: str, client=None) -> list[SourceDocument]:
+        return _website_docs(url)
+
+    async def no_news(startup_name: str, max_articles: int, client=None) -> list[SourceDocument]:
+        return []
+
+    monkeypatch.setattr(pipeline, "scrape_website", fake_website)
+    monkeypatch.setattr(pipeline, "scrape_news", no_news)
+    monkeypatch.setattr(pipeline, "BGEEmbedder", _HashEmbedder)
+    monkeypatch.setattr(qdrant_client.settings, "local_vector_store_path", "")
+    monkeypatch.setattr(qdrant_client, "_shared_local_stores", {})
+    monkeypatch.setattr(qdrant_client.settings, "local_ann_min_points", 1)
+
+    payload = AnalyzeStartupRequest(startup_name="Acme", website_url="https://acme.example.com")
+    events: list[dict] = []
+    asyncio.run(pipeline.run_analysis(payload))
+    asyncio.run(pipeline.run_analysis(payload, on_event=lambda event, data: events.append(data)))
+    embedding = next(e for e in events if e.get("stage") == "embedding" and e["status"] == "completed")
+    assert embedding["reused"] >= 1 and embedding["vectors"] == 0
+    indexing = next(e for e in events if e.get("stage") == "indexing" and e["status"] == "completed")
+    assert indexing["ann_recall_at_10"] == 1.0
+    assert "quantized_recall_at_10" not in indexing
+
+    assert asyncio.run(NamespaceSweeper(ttl_seconds=3600, interval_seconds=60).sweep()) == 0
+    assert asyncio.run(NamespaceSweeper(ttl_seconds=-1, interval_seconds=60).sweep()) == embedding["reused"]
+    assert asyncio.run(NamespaceSweeper(ttl_seconds=-1, interval_seconds=60).sweep()) == 0
+
+
+def test_sections_reach_stream_consumers_before_later_agents_finish(monkeypatch) -> None:
+    async def fake_website(url: str, client=None) -> list[SourceDocument]:
+        return _website_docs(url)
+
+    async def no_news(startup_name: str, max_articles: int, client=None) -> list[SourceDocument]:
+        return []
+
+    market_delivered = threading.Event()
+    run_risk_agent = pipeline.run_risk_agent
+
+    def waiting_risk_agent(startup_name: str, hits):
+        # Blocks until the consumer task has seen the market section (i.e. the loop got to run it).
+        assert market_delivered.wait(timeout=5)
+        return run_risk_agent(startup_name, hits)
+
+    monkeypatch.setattr(pipeline, "scrape_website", fake_website)
+    monkeypatch.setattr(pipeline, "scrape_news", no_news)
+    monkeypatch.setattr(pipeline, "BGEEmbedder", _HashEmbedder)
+    monkeypatch.setattr(pipeline, "run_risk_agent", waiting_risk_agent)
+    monkeypatch.setattr(qdrant_client.settings, "local_vector_store_path", "")
+    monkeypatch.setattr(qdrant_client, "_shared_local_stores", {})
+
+    async def main() -> list[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        sections: list[str] = []
+
+        async def consume() -> None:
+            while (item := await queue.get()) is not None:
+                event, data = item
+                if event == "section":
+                    sections.append(data["name"])
+                    if data["name"] == "market":
+                        market_delivered.set()
+
+        consumer = asyncio.create_task(consume())
+        payload = AnalyzeStartupRequest(startup_name="Acme", website_url="https://acme.example.com")
+        await pipeline.run_analysis(payload, on_event=lambda event, data: queue.put_nowait((event, data)))
+        queue.put_nowait(None)
+        await consumer
+        return sections
+
+    assert asyncio.run(main()) == ["market", "competition", "traction", "risk_assessment", "business_model"]
+
+
+def test_indexing_reports_quantized_recall(monkeypatch) -> None:
+    async def fake_website(url: str, client=None) -> list[SourceDocument]:
+        return _website_docs(url)
+
+    async def no_news(startup_name: str, max_articles: int, client=None) -> list[SourceDocument]:
+        return []
+
+    monkeypatch.setattr(pipeline, "scrape_website", fake_website)
+    monkeypatch.setattr(pipeline, "scrape_news", no_news)
+    monkeypatch.setattr(pipeline, "BGEEmbedder", _HashEmbedder)
+    monkeypatch.setattr(qdrant_client.settings, "local_vector_store_path", "")
+    monkeypatch.setattr(qdrant_client.settings, "local_vector_dtype", "int8")
+    monkeypatch.setattr(qdrant_client, "_shared_local_stores", {})
+
+    payload = AnalyzeStartupRequest(startup_name="Acme", website_url="https://acme.example.com")
+    events: list[dict] = []
+    asyncio.run(pipeline.run_analysis(payload, on_event=lambda event, data: events.append(data)))
+    indexing = next(e for e in events if e.get("stage") == "indexing" and e["status"] == "completed")
+    assert 0.0 < indexing["quantized_recall_at_10"] <= 1.0
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import date
+
+from app.models.schemas import (
+    AnalyzeStartupRequest,
+    AnalyzeStartupResponse,
+    EvaluationMetrics,
+    InvestmentMemo,
+    MemoSection,
+    RunMetrics,
+)
+from app.services.result_cache import ResultCache, request_fingerprint
+
+
+def _response(latency_ms: int) -> AnalyzeStartupResponse:
+    section = MemoSection(summary="s", score=5.0)
+    return AnalyzeStartupResponse(
+        status="ok",
+        report=InvestmentMemo(
+            startup_name="Acme",
+            generated_on=date.today(),
+            market=section,
+            competition=section,
+            traction=section,
+            business_model=section,
+            risk_assessment=section,
+            key_risks=[],
+            recommendation="r",
+        ),
+        evaluation=EvaluationMetrics(
+            retrieval_relevance=5.0,
+            citation_coverage=0.5,
+            consistency_score=5.0,
+            hallucination_risk=0.5,
+            judge_verdict="acceptable",
+        ),
+        metrics=RunMetrics(latency_ms=latency_ms, input_characters=1, estimated_input_tokens=1, estimated_cost_usd=0.0),
+        sources_indexed=1,
+    )
+
+
+def test_fingerprint_normalizes_request() -> None:
+    a = AnalyzeStartupRequest(
+        startup_name=" Acme  AI ",
+        website_url="https://acme.example.com/",
+        public_pdf_urls=["https://acme.example.com/b.pdf", "https://acme.example.com/a.pdf"],
+    )
+    b = AnalyzeStartupRequest(
+        startup_name="acme ai",
+        website_url="https://acme.example.com",
+        public_pdf_urls=["https://acme.example.com/a.pdf", "https://acme.example.com/b.pdf"],
+    )
+    assert request_fingerprint(a) == request_fingerprint(b)
+
+
+def test_fresh_stale_and_bypass() -> None:
+    runs: list[int] = []
+
+    async def runner(emit) -> AnalyzeStartupResponse:
+        runs.append(1)
+        return _response(latency_ms=len(runs))
+
+    async def scenario() -> list[AnalyzeStartupResponse]:
+        cache = ResultCache(ttl_seconds=60, stale_seconds=60)
+        first = await cache.get_or_run("k", runner)
+        fresh = await cache.get_or_run("k", runner)
+
+        cache.ttl_seconds = 0.0001
+        await asyncio.sleep(0.001)
+        stale = await cache.get_or_run("k", runner)
+        await asyncio.sleep(0.01)
+        cache.ttl_seconds = 60
+        refreshed = await cache.get_or_run("k", runner)
+        bypassed = await cache.get_or_run("k", runner, force_refresh=True)
+        return [first, fresh, stale, refreshed, bypassed]
+
+    first, fresh, stale, refreshed, bypassed = asyncio.run(scenario())
+
+    assert not first.cached
+    assert fresh.cached and fresh.metrics.latency_ms == 1
+    assert stale.cached and stale.metrics.latency_ms == 1
+    assert refreshed.cached and refreshed.metrics.latency_ms == 2
+    assert not bypassed.cached and bypassed.metrics.latency_ms == 3
+
+
+def test_concurrent_identical_requests_share_one_run() -> None:
+    runs: list[int] = []
+
+    async def runner(emit) -> AnalyzeStartupResponse:
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        emit("stage", {"stage": "ingestion", "status": "completed"})
+        return _response(latency_ms=len(runs))
+
+    received: list[list[str]] = [[] for _ in range(5)]
+
+    async def scenario() -> list[AnalyzeStartupResponse]:
+        cache = ResultCache(ttl_seconds=60, stale_seconds=0)
+        responses = await asyncio.gather(
+            *(
+                cache.get_or_run("k", runner, on_event=lambda event, data, i=i: received[i].append(event))
+                for i in range(5)
+            )
+        )
+        cached = await cache.get_or_run("k", runner, on_event=lambda event, data: received[0].append(event))
+        return [*responses, cached]
+
+    *responses, cached = asyncio.run(scenario())
+
+    assert len(runs) == 1
+    assert {r.metrics.latency_ms for r in responses} == {1}
+    # Every waiter sees the shared run's progress; a later cache hit runs nothing.
+    assert received == [["stage"]] * 5 and cached.cached
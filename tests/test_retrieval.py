@@ -0,0 +1,335 @@
+import os
+import sys
+import threading
+from types import ModuleType, SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.embeddings.embedder import BGEEmbedder
+from app.models.schemas import SourceDocument
+from app.retrieval.chunk_store import ChunkStore
+from app.retrieval.chunker import ChunkTokenizer, chunk_documents, iter_chunks
+from app.retrieval.dedup import deduplicate_chunks
+from app.retrieval.inverted_index import PersistentInvertedIndex, PersistentKeywordView
+from app.retrieval.local_store import LocalVectorStore
+from app.retrieval.mmap_store import MmapVectorStore
+from app.retrieval import qdrant_client
+from app.retrieval.qdrant_client import VentureQdrant
+from app.retrieval.search import HybridRetriever, RetrievalSpec, hybrid_search, retrieve_batch
+
+
+CORPUS = [
+    {"id": "1", "source": "a", "type": "web", "content": "Acme sells AI agents to enterprise customers", "metadata": {"category": "overview"}},
+    {"id": "2", "source": "b", "type": "news", "content": "Acme raised funding from growth partners", "metadata": {"category": "news"}},
+    {"id": "3", "source": "c", "type": "news", "content": "Competitors include Beta and Gamma platforms", "metadata": {"category": "news"}},
+    {"id": "4", "source": "d", "type": "pdf", "content": "Compliance and security risk remain open questions", "metadata": {"category": "pdf"}},
+]
+
+
+def _index() -> tuple[BGEEmbedder, VentureQdrant]:
+    embedder = BGEEmbedder("tfidf-only-test-model")
+    vectors = embedder.embed_texts([d["content"] for d in CORPUS])
+    store = VentureQdrant(collection_name="test", vector_size=len(vectors[0]))
+    store.upsert_documents([SourceDocument(**d) for d in CORPUS], vectors, ids=[d["id"] for d in CORPUS])
+    return embedder, store
+
+
+def test_batched_retrieval_matches_single_queries() -> None:
+    embedder, store = _index()
+    specs = [
+        RetrievalSpec("Acme customers funding growth", top_k=3),
+        RetrievalSpec("competitors platforms", top_k=2),
+        RetrievalSpec("security risk", metadata_filter={"category": "pdf"}, top_k=2),
+    ]
+
+    retriever = HybridRetriever(CORPUS)
+    batched = retrieve_batch(embedder, store, retriever, specs)
+
+    for spec, hits in zip(specs, batched):
+        vector_hits = store.search(embedder.embed_query(spec.query), top_k=12, metadata_filter=spec.metadata_filter)
+        single = hybrid_search(vector_hits, CORPUS, spec.query, top_k=spec.top_k, metadata_filter=spec.metadata_filter)
+        assert [(h.source, round(h.score, 6)) for h in hits] == [(h.source, round(h.score, 6)) for h in single]
+    assert all(h.metadata["category"] == "pdf" for h in batched[2])
+
+
+def test_persistent_keyword_index_updates_incrementally(tmp_path) -> None:
+    index = PersistentInvertedIndex(str(tmp_path / "keywords.sqlite3"))
+    index.add_documents([d["id"] for d in CORPUS], [d["content"] for d in CORPUS])
+    assert len(index) == 4
+    assert index.search("acme funding", top_k=1)[0][0] == "2"
+
+    # Replacing and removing chunks updates postings without a rebuild.
+    index.add_documents(["2"], ["Delta platforms compete on price"])
+    index.remove_documents(["3"])
+    assert len(index) == 3
+    assert [doc_id for doc_id, _ in index.search("platforms", top_k=5)] == ["2"]
+    assert index.search("funding", top_k=5) == []
+
+    exhaustive = index.search("acme agents customers security", top_k=10)
+    assert index.search("acme agents customers security", top_k=2) == exhaustive[:2]
+
+    view = PersistentKeywordView(index, ["1", "2", "4"])
+    retriever = HybridRetriever([d for d in CORPUS if d["id"] != "3"], keyword_index=view)
+    assert retriever.keyword_scores("security risk")[2] > 0
+
+
+def test_persistent_keyword_index_scopes_large_candidate_sets_in_sql() -> None:
+    index = PersistentInvertedIndex(":memory:")
+    ids = [str(i) for i in range(3000)]
+    index.add_documents(ids, [f"the {'acme ' * (1 + i % 3) if i % 2 else ''}doc{i}" for i in range(3000)])
+
+    # "acme" alone ranks 1500 candidates past the bound of "the", so MaxScore rescoring joins against all of them.
+    assert index.search("acme the", top_k=3) == index.search("acme the", top_k=3000)[:3]
+
+    corpus = ids[:10]
+    view = PersistentKeywordView(index, corpus)
+    batch = view.scores_batch(["acme the", "doc3"])
+    assert batch.shape == (2, 10) and batch[1].nonzero()[0].tolist() == [3]
+    assert np.allclose(batch[0], view.scores("acme the")) and batch[0][1] > batch[0][0] > 0
+
+
+def test_local_vector_store_grows_overwrites_and_filters() -> None:
+    store = LocalVectorStore(vector_size=2, initial_capacity=1)
+    store.upsert(["a", "b", "c"], [[1, 0], [0, 1], [1, 1]], [{"metadata": {"k": i % 2}} for i in range(3)])
+    store.upsert(["b"], [[1, 0.1]], [{"metadata": {"k": 1}}])
+    assert len(store) == 3
+
+    hits = store.search_batch([[1, 0]], top_ks=[2])[0]
+    assert [hit.id for hit in hits] == ["a", "b"]
+    assert hits[0].score == pytest.approx(1.0)
+
+    filtered = store.search_batch([[1, 0]], top_ks=[5], metadata_filters=[{"k": 0}])[0]
+    assert [hit.id for hit in filtered] == ["a", "c"]
+
+
+def test_chunk_ids_are_stable_and_upserts_idempotent() -> None:
+    doc = SourceDocument(source="https://acme.example.com", type="web", content="Acme sells AI agents. " * 40)
+    first = chunk_documents([doc], ChunkTokenizer(max_tokens=50), overlap_tokens=5)
+    second = chunk_documents([doc], ChunkTokenizer(max_tokens=50), overlap_tokens=5)
+    assert [c.id for c in first] == [c.id for c in second]
+    assert len({c.id for c in first}) == len(first)
+
+    embedder = BGEEmbedder("tfidf-only-test-model")
+    vectors = embedder.embed_texts([c.content for c in first])
+    store = VentureQdrant(collection_name="test", vector_size=len(vectors[0]))
+    for _ in range(2):
+        store.upsert_documents(first, vectors, ids=[c.id for c in first])
+    assert store.existing_ids([c.id for c in first] + ["missing"]) == {c.id for c in first}
+    assert len(store.search(vectors[0], top_k=100)) == len({c.id for c in first})
+
+
+def test_namespaces_scope_search_and_expire() -> None:
+    embedder = BGEEmbedder("tfidf-only-test-model")
+    vectors = embedder.embed_texts([d["content"] for d in CORPUS])
+    acme = VentureQdrant(collection_name="test", vector_size=len(vectors[0]), namespace="acme")
+    acme.upsert_documents([SourceDocument(**d) for d in CORPUS[:2]], vectors[:2], ids=["1", "2"])
+    # Same underlying store, different namespace.
+    acme.namespace = "beta"
+    acme.upsert_documents([SourceDocument(**d) for d in CORPUS[2:]], vectors[2:], ids=["3", "4"])
+
+    assert {hit.id for hit in acme.search(vectors[0], top_k=10)} == {"3", "4"}
+    acme.namespace = "acme"
+    assert {hit.id for hit in acme.search(vectors[0], top_k=10)} == {"1", "2"}
+
+    assert acme.delete_expired(max_age_seconds=3600) == []
+    assert sorted(acme.delete_expired(max_age_seconds=-1)) == ["1", "2", "3", "4"]
+    assert acme.search(vectors[0], top_k=10) == []
+
+
+def test_retrieval_ignores_stale_points_of_the_namespace(tmp_path) -> None:
+    embedder = BGEEmbedder("tfidf-only-test-model")
+    vectors = embedder.embed_texts([d["content"] for d in CORPUS])
+    retriever = HybridRetriever(CORPUS[:2])
+    spec = RetrievalSpec("Acme customers funding growth", top_k=2)
+    stores = [LocalVectorStore(vector_size=len(vectors[0])), MmapVectorStore(str(tmp_path / "vectors"), len(vectors[0]))]
+    for store in stores:
+        # Points from an earlier run of the same startup: near-copies of the query that are no longer in the corpus.
+        stale_ids = [f"old-{i}" for i in range(30)]
+        stale = np.repeat(embedder.embed_queries([spec.query]), len(stale_ids), axis=0)
+        store.upsert(stale_ids, stale, [{"namespace": "acme"} for _ in stale_ids])
+        store.upsert(["1", "2"], vectors[:2], [{"namespace": "acme", **d["metadata"]} for d in CORPUS[:2]])
+
+        query = embedder.embed_queries([spec.query])
+        hits = store.search_batch(query, top_ks=[4], namespace="acme", point_ids=retriever.chunk_ids)[0]
+        assert {hit.id for hit in hits} == {"1", "2"}
+        scores = retriever.vector_scores(hits + store.search_batch(stale[:1], top_ks=[1], namespace="acme")[0])
+        assert sorted(scores.tolist()) == [0.0, 1.0]
+
+
+def test_local_ann_index_trains_and_accepts_incremental_inserts() -> None:
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(8, 16))
+    vectors = centers[rng.integers(0, 8, 400)] + 0.1 * rng.normal(size=(400, 16))
+    store = LocalVectorStore(vector_size=16, ann_min_points=300, ann_nprobe=3)
+    store.upsert([str(i) for i in range(299)], vectors[:299], [{} for _ in range(299)])
+    assert store.ann_recall() is None
+    store.upsert(["299"], vectors[299:300], [{}])
+    store.upsert([str(i) for i in range(300, 400)], vectors[300:], [{} for _ in range(100)])
+
+    assert store._ann.trained
+    assert store.search_batch([vectors[350]], top_ks=[1])[0][0].id == "350"
+    assert store.recall_at_k(k=5, sample=50) >= 0.9
+    assert store.ann_recall() >= 0.9
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_quantized_local_store_keeps_recall(dtype) -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 32))
+    ids = [str(i) for i in range(500)]
+    store = LocalVectorStore(vector_size=32, dtype=dtype, rescore=True)
+    store.upsert(ids, vectors, [{} for _ in ids])
+
+    assert store.memory_stats()["vector_bytes_per_point"] < 4 * 32
+    assert store.search_batch([vectors[7]], top_ks=[1])[0][0].id == "7"
+    assert store.recall_at_k(k=10, sample=50) >= 0.95
+    assert store.quantization_recall(vectors) >= 0.95
+    assert 0.5 <= LocalVectorStore(vector_size=32, dtype=dtype).quantization_recall(vectors) <= 1.0
+    assert LocalVectorStore(vector_size=32).quantization_recall(vectors) is None
+
+
+def test_mmap_store_persists_and_ignores_torn_appends(tmp_path) -> None:
+    directory = str(tmp_path / "vectors")
+    store = MmapVectorStore(directory, vector_size=2)
+    payloads = [{"namespace": "acme", "content": c, "metadata": {"k": i}} for i, c in enumerate(["a", "b", "c"])]
+    store.upsert(["a", "b", "c"], [[1, 0], [0, 1], [1, 1]], payloads)
+    store.upsert(["b"], [[1, 0.1]], [{"namespace": "beta", "content": "b2", "metadata": {"k": 1}}])
+    store.close()
+
+    # Simulate a crash mid-append: bytes past the committed row count are ignored.
+    with open(os.path.join(directory, "vectors.f32"), "ab") as handle:
+        handle.write(b"\x00" * 16)
+
+    reopened = MmapVectorStore(directory)
+    assert reopened.vector_size == 2 and len(reopened) == 3
+    assert [hit.id for hit in reopened.search_batch([[1, 0]], top_ks=[2])[0]] == ["a", "b"]
+    assert [hit.id for hit in reopened.search_batch([[1, 0]], top_ks=[5], namespace="acme")[0]] == ["a", "c"]
+    filtered = reopened.search_batch([[1, 0]], top_ks=[5], metadata_filters=[{"k": 1}])[0]
+    assert [(hit.id, hit.payload["content"]) for hit in filtered] == [("b", "b2")]
+
+    reopened.upsert(["d"], [[0, 1]], [{"namespace": "acme", "content": "d"}])
+    assert reopened.search_batch([[0, 1]], top_ks=[1])[0][0].id == "d"
+    assert reopened.delete(["d"]) == 1 and reopened.existing_ids(["a", "d"]) == {"a"}
+
+
+def test_chunker_respects_token_budget_and_sentence_boundaries() -> None:
+    text = "Acme builds agents. They sell to banks! Growth is strong.\n\nRisk remains in compliance reviews. " * 20
+    doc = SourceDocument(source="s", type="web", content=text)
+    tokenizer = ChunkTokenizer(max_tokens=50)
+
+    refs = iter_chunks([doc], tokenizer, overlap_tokens=8)
+    first = next(refs)
+    assert (first.start, first.chunk_index) == (0, 0)
+    assert first.text.endswith(".") and first.tokens <= tokenizer.max_tokens
+
+    chunks = [first, *refs]
+    assert all(ref.tokens <= tokenizer.max_tokens for ref in chunks)
+    assert chunks[-1].end == len(text.rstrip())
+    assert all(ref.text[0].isupper() for ref in chunks)
+
+
+def test_near_duplicate_chunks_are_dropped() -> None:
+    headline = "Acme raises a 20 million dollar Series A to expand its AI agent platform across European banks"
+    chunks = ChunkStore.from_records(
+        [
+            {"id": "1", "source": "reuters", "type": "news", "content": headline},
+            {"id": "2", "source": "techcrunch", "type": "news", "content": f"{headline}."},
+            {"id": "3", "source": "site", "type": "web", "content": "Compliance reviews and security audits remain open risks"},
+        ]
+    )
+    kept, removed = deduplicate_chunks(chunks, threshold=0.85)
+
+    assert removed == 1
+    assert kept.ids == ["1", "3"]
+    assert kept.metadata(0)["duplicate_sources"] == ["techcrunch"]
+
+
+def test_mmap_store_compacts_tombstones_and_syncs_other_handles(tmp_path) -> None:
+    directory = str(tmp_path / "vectors")
+    writer = MmapVectorStore(directory, vector_size=8, compact_min_rows=4, ann_min_points=50, ann_lists=4)
+    reader = MmapVectorStore(directory)
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(100, 8)).astype(np.float32)
+    ids = [str(i) for i in range(100)]
+    writer.upsert(ids, vectors, [{"namespace": "acme"} for _ in ids])
+    assert writer.memory_stats()["ann_trained"] and reader.ann_recall() is None
+    assert 0.0 < writer.ann_recall() <= 1.0
+
+    writer.upsert(["5"], [vectors[6]], [{"namespace": "acme"}])
+    assert {hit.id for hit in reader.search_batch([vectors[6]], top_ks=[2], exact=True)[0]} == {"5", "6"}
+    writer.delete(ids[:60])
+
+    stats = writer.memory_stats()
+    assert (stats["points"], stats["tombstoned_rows"]) == (40, 0)
+    assert [name for name in os.listdir(directory) if name.endswith(".f32")] == ["vectors.1.f32"]
+    assert os.path.getsize(os.path.join(directory, "vectors.1.f32")) == 40 * 8 * 4
+
+    hit = reader.search_batch([vectors[70]], top_ks=[1], exact=True)[0][0]
+    assert (hit.id, round(hit.score, 5)) == ("70", 1.0)
+    assert reader.search_batch([vectors[70]], top_ks=[3], namespace="acme")[0][0].id == "70"
+    assert reader.delete(["5", "70"]) == 1 and "70" not in {h.id for h in writer.search_batch([vectors[70]], top_ks=[5])[0]}
+
+
+def test_mmap_store_remaps_when_compacted_between_meta_read_and_map(tmp_path, monkeypatch) -> None:
+    directory = str(tmp_path / "vectors")
+    writer = MmapVectorStore(directory, vector_size=8, compact_min_rows=4)
+    reader = MmapVectorStore(directory)
+    vectors = np.random.default_rng(4).normal(size=(20, 8)).astype(np.float32)
+    ids = [str(i) for i in range(20)]
+    writer.upsert(ids, vectors, [{} for _ in ids])
+
+    memmap = np.memmap
+    compacted: list[bool] = []
+
+    def racing_memmap(path, *args, **kwargs):
+        if not compacted:
+            # The writer compacts (and unlinks `path`) right after the reader read the meta rows.
+            compacted.append(True)
+            writer.delete(ids[:12])
+        return memmap(path, *args, **kwargs)
+
+    monkeypatch.setattr(np, "memmap", racing_memmap)
+    hit = reader.search_batch([vectors[15]], top_ks=[1], exact=True)[0][0]
+    assert (hit.id, round(hit.score, 5)) == ("15", 1.0)
+    assert reader.memory_stats()["points"] == 8
+
+
+class _RecordingQdrantClient:
+    def __init__(self, **kwargs) -> None:
+        self.calls: list[tuple[int, bool]] = []
+        self._lock = threading.Lock()
+
+    def get_collections(self):
+        return SimpleNamespace(collections=[SimpleNamespace(name="test")])
+
+    def upsert(self, collection_name: str, points, wait: bool) -> None:
+        size = len(points.ids) if hasattr(points, "ids") else len(points)
+        with self._lock:
+            self.calls.append((size, wait))
+
+
+def test_qdrant_upserts_in_parallel_batches_and_flushes_once(monkeypatch) -> None:
+    fake = ModuleType("qdrant_client")
+    fake.QdrantClient = _RecordingQdrantClient
+    models = ModuleType("qdrant_client.http.models")
+    models.Batch = lambda ids, vectors, payloads: SimpleNamespace(ids=ids, vectors=vectors, payloads=payloads)
+    models.PointStruct = lambda id, vector, payload: SimpleNamespace(id=id, vector=vector, payload=payload)
+    http = ModuleType("qdrant_client.http")
+    http.models = models
+    monkeypatch.setitem(sys.modules, "qdrant_client", fake)
+    monkeypatch.setitem(sys.modules, "qdrant_client.http", http)
+    monkeypatch.setitem(sys.modules, "qdrant_client.http.models", models)
+    monkeypatch.setattr(qdrant_client.settings, "qdrant_upsert_batch_size", 4)
+    monkeypatch.setattr(qdrant_client.settings, "qdrant_upsert_parallelism", 3)
+
+    store = VentureQdrant(collection_name="test", vector_size=2)
+    chunks = ChunkStore.from_records([{"id": str(i), "source": "s", "type": "web", "content": f"c{i}"} for i in range(10)])
+    assert store.upsert_chunks(chunks, np.ones((10, 2)), wait=False) == 10
+
+    client = store.client
+    assert sorted(client.calls) == [(2, False), (4, False), (4, False)]
+    store.flush()
+    assert client.calls[-1] == (1, True)
+    store.flush()
+    assert len(client.calls) == 4
@@ -1,6 +1,10 @@
+import json
+
 from fastapi.testclient import TestClient
 
 from app.api.main import app
+from app.models.schemas import SourceDocument
+from app.services import pipeline
 
 
 client = TestClient(app)
@@ -17,3 +21,54 @@ def test_ui() -> None:
     response = client.get("/ui")
     assert response.status_code == 200
     assert "VentureLens AI" in response.text
+
+
+def test_analyze_stream_emits_sections_before_result(monkeypatch) -> None:
+    async def fake_website(url: str, client=None) -> list[SourceDocument]:
+        return [SourceDocument(source=url, type="website_paragraphs", content="Acme builds AI agents for customers.")]
+
+    async def no_news(startup_name: str, max_articles: int, client=None) -> list[SourceDocument]:
+        return []
+
+    monkeypatch.setattr(pipeline, "scrape_website", fake_website)
+    monkeypatch.setattr(pipeline, "scrape_news", no_news)
+
+    response = client.post(
+        "/analyze_startup/stream",
+        json={"startup_name": "Acme", "website_url": "https://acme.example.com"},
+    )
+    assert response.status_code == 200
+    events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events[0] == "stage"
+    assert "section" in events
+    assert events.index("section") < events.index("result")
+    assert events[-1] == "result"
+
+
+def test_analyze_batch_streams_ndjson_per_item(monkeypatch) -> None:
+    async def fake_website(url: str, client=None) -> list[SourceDocument]:
+        if "broken" in url:
+            raise RuntimeError("unreachable")
+        return [SourceDocument(source=url, type="website_paragraphs", content="Acme builds AI agents for customers.")]
+
+    async def no_news(startup_name: str, max_articles: int, client=None) -> list[SourceDocument]:
+        return []
+
+    monkeypatch.setattr(pipeline, "scrape_website", fake_website)
+    monkeypatch.setattr(pipeline, "scrape_news", no_news)
+
+    response = client.post(
+        "/analyze_startup/batch",
+        json={
+            "items": [
+                {"startup_name": "Acme", "website_url": "https://acme.example.com"},
+                {"startup_name": "Broken", "website_url": "https://broken.example.com"},
+                {"startup_name": "Beta", "website_url": "https://beta.example.com"},
+            ],
+            "concurrency": 2,
+        },
+    )
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    assert {line["startup_name"]: line["status"] for line in lines} == {"Acme": "ok", "Broken": "error", "Beta": "ok"}